@@ -1,22 +1,29 @@
 #!/usr/bin/python3
 
+import sys
+
+# This has to happen before anything else is imported, or it won't see it.
+if "--profile-startup" in sys.argv:
+    from util import startupProfile
+    startupProfile.install()
+
 import gi
 gi.require_version('Gtk', '3.0')
 gi.require_version('GdkX11', '3.0')
 gi.require_version('CScreensaver', '1.0')
 
-from gi.repository import Gtk, Gdk, CScreensaver, Gio
+from gi.repository import Gtk, Gdk, CScreensaver, Gio, GLib
 
 import signal
 import gettext
 import argparse
 import os
 import setproctitle
-import sys
 
 import config
 import status
-from util import utils, settings
+from util import utils, settings, timing, startupProfile, snapshot
+from util.utils import DEBUG
 from service import ScreensaverService
 
 signal.signal(signal.SIGINT, signal.SIG_DFL)
@@ -34,13 +41,19 @@ class Main(Gtk.Application):
                                    inactivity_timeout=30000,
                                    flags=Gio.ApplicationFlags.IS_SERVICE)
 
-        # Our service must be set up before we register with the session manager.
-        ScreensaverService()
+        # Our service must be set up before we register with the session manager.  This only
+        # exports the interface - the manager (and the rest of the program) are loaded in
+        # do_startup, after our name has been acquired.
+        self.service = ScreensaverService()
+
+        self.fallback_provider = None
 
     def do_activate(self):
         pass
 
     def do_startup(self):
+        startupProfile.mark("name acquired")
+
         print("Starting screensaver...", flush=True)
         Gtk.Application.do_startup(self)
 
@@ -58,6 +71,26 @@ class Main(Gtk.Application):
                                  "Normally cinnamon-screensaver will exit after being idle for 30 seconds.")
         parser.add_argument('--no-fallback', dest='no_fallback', action='store_true',
                             help="Don't spawn a fallback window when locking the screen.")
+        parser.add_argument('--print-timings', dest='print_timings', action='store_true',
+                            help="Print the duration of each phase of activation (used by tests/benchmark-lock)")
+        parser.add_argument('--trace', dest='trace_file', metavar='FILE', default=None,
+                            help="Record the time spent activating, refreshing and unlocking, and write it to FILE "
+                                 "in Chrome trace event format (tracing can also be toggled over dbus using SetTracing)")
+        parser.add_argument('--retain-stage', dest='retain_stage', action='store_true',
+                            help="Keep the lock screen around after unlocking, so the next lock only needs to show it again. " \
+                                 "This is most useful along with --hold.")
+        parser.add_argument('--resident', dest='resident', action='store_true',
+                            help="Keep the process running (like --hold), but give back as much memory as possible "
+                                 "whenever the screensaver is idle.")
+        parser.add_argument('--memory-budget', dest='memory_budget', metavar='MB', type=int, default=0,
+                            help="With --resident, the most memory (resident set size) to use while idle.  If trimming "
+                                 "can't get below this, exit when idle as usual.")
+        parser.add_argument('--freeze-gc', dest='freeze_gc', action='store_true',
+                            help="With --resident, move everything left after trimming to Python's permanent "
+                                 "generation, so the garbage collector doesn't need to keep scanning it.")
+        parser.add_argument('--profile-startup', dest='profile_startup', action='store_true',
+                            help="Print the time spent importing each module and typelib during startup, " \
+                                 "and when the lock screen modules are loaded afterwards")
         args = parser.parse_args()
 
         if settings.get_custom_screensaver() != '':
@@ -72,11 +105,24 @@ class Main(Gtk.Application):
         status.Debug = args.debug
         status.InteractiveDebug = args.interactive
         status.UseFallback = not args.no_fallback
+        status.RetainStage = args.retain_stage
+        status.Resident = args.resident
+        status.MemoryBudget = args.memory_budget * 1024 * 1024
+        status.FreezeGC = args.freeze_gc
+        timing.Enabled = args.print_timings
+
+        if args.trace_file is not None:
+            timing.set_tracing(True, args.trace_file)
         # The inactivity-timeout will be ignored until there's been an initial hold. Simply
         # starting the app and letting it idle will end up with it exiting after 10s no matter
         # what the timeout.
         self.hold()
 
+        # Resident mode keeps a hold of its own, the manager drops it if we can't keep to our
+        # memory budget (the one for --hold is kept either way).
+        if args.resident:
+            self.hold()
+
         if not args.hold:
             self.release()
 
@@ -86,11 +132,20 @@ class Main(Gtk.Application):
         if args.lock_disabled:
             print("Locking disabled", flush=True)
 
-        # This is here mainly to allow the notification watcher to have a valid status.Debug value
-        import singletons
+        # This is here (and not in __init__) to allow the manager and our singletons (the
+        # notification watcher in particular) to have a valid status.Debug value.
+        self.service.start()
+
         Gtk.Settings.get_default().connect("notify::gtk-theme-name", self.on_theme_changed)
         self.do_style_overrides()
 
+        startupProfile.report("startup complete")
+
+    def do_shutdown(self):
+        timing.flush_trace()
+
+        Gtk.Application.do_shutdown(self)
+
     def on_theme_changed(self, settings, pspec, data=None):
         self.do_style_overrides()
 
@@ -104,13 +159,78 @@ class Main(Gtk.Application):
         theme string, we check for a variable name we can use for the fallback experience,
         and adjust it in our application stylesheet if necessary before adding it as a
         provider.
+
+        Serializing the theme is slow, so the result is kept in our startup snapshot.  If
+        the theme hasn't changed since, we use that right away and check it again at idle.
         """
         theme_name = Gtk.Settings.get_default().get_property("gtk-theme-name")
-        provider = Gtk.CssProvider.get_named(theme_name)
+        key = self.get_theme_key(theme_name)
 
-        css = provider.to_string()
+        support = snapshot.lookup("theme", key)
 
-        if ".csstage" not in css:
+        if support is None:
+            support = self.check_theme_support(theme_name)
+            snapshot.store("theme", key, support)
+        else:
+            GLib.idle_add(self.verify_theme_support, theme_name, key, support, priority=GLib.PRIORITY_LOW)
+
+        self.apply_theme_support(support)
+
+    def get_theme_key(self, theme_name):
+        """
+        The theme name, along with the latest modification time of its gtk-3.0 stylesheets.
+        """
+        dirs = [os.path.join(GLib.get_user_data_dir(), "themes"),
+                os.path.join(GLib.get_home_dir(), ".themes")]
+        dirs += [os.path.join(d, "themes") for d in GLib.get_system_data_dirs()]
+
+        for d in dirs:
+            gtk_dir = os.path.join(d, theme_name, "gtk-3.0")
+
+            try:
+                mtime = max(os.stat(os.path.join(gtk_dir, f)).st_mtime for f in os.listdir(gtk_dir) if f.endswith(".css"))
+            except (OSError, ValueError):
+                continue
+
+            return "%s:%s:%d" % (theme_name, gtk_dir, mtime)
+
+        # Built-in theme (Adwaita, HighContrast)
+        return "%s:builtin:%s" % (theme_name, Gtk.get_micro_version())
+
+    def check_theme_support(self, theme_name):
+        css = Gtk.CssProvider.get_named(theme_name).to_string()
+
+        if "@define-color theme_selected_bg_color" in css:
+            color = "theme_selected_bg_color"
+        elif "@define-color selected_bg_color" in css:
+            color = "selected_bg_color"
+        else:
+            color = None
+
+        return { "csstage": ".csstage" in css, "color": color }
+
+    def verify_theme_support(self, theme_name, key, support):
+        if Gtk.Settings.get_default().get_property("gtk-theme-name") != theme_name:
+            return False
+
+        current = self.check_theme_support(theme_name)
+
+        if current != support:
+            DEBUG("Theme support has changed since our snapshot was taken, updating")
+            snapshot.store("theme", key, current)
+            self.apply_theme_support(current)
+
+        return False
+
+    def apply_theme_support(self, support):
+        changed = False
+
+        if self.fallback_provider is not None:
+            Gtk.StyleContext.remove_provider_for_screen(Gdk.Screen.get_default(), self.fallback_provider)
+            self.fallback_provider = None
+            changed = True
+
+        if not support["csstage"]:
             print("Cinnamon Screensaver support not found in current theme - adding some...", flush=True)
 
             path = os.path.join(config.pkgdatadir, "cinnamon-screensaver.css")
@@ -119,9 +239,9 @@ class Main(Gtk.Application):
             fallback_css = f.read()
             f.close()
 
-            if "@define-color theme_selected_bg_color" in css:
+            if support["color"] == "theme_selected_bg_color":
                 pass
-            elif "@define-color selected_bg_color" in css:
+            elif support["color"] == "selected_bg_color":
                 print("replacing theme_selected_bg_color with selected_bg_color", flush=True)
                 fallback_css = fallback_css.replace("@theme_selected_bg_color", "@selected_bg_color")
             else:
@@ -133,10 +253,14 @@ class Main(Gtk.Application):
             try:
                 fallback_prov.load_from_data(fallback_css.encode())
                 Gtk.StyleContext.add_provider_for_screen (Gdk.Screen.get_default(), fallback_prov, 600)
-                Gtk.StyleContext.reset_widgets(Gdk.Screen.get_default())
+                self.fallback_provider = fallback_prov
+                changed = True
             except Exception as e:
                 print("Could not parse fallback css: %s" % str(e))
 
+        if changed:
+            Gtk.StyleContext.reset_widgets(Gdk.Screen.get_default())
+
 if __name__ == "__main__":
     setproctitle.setproctitle('cinnamon-screensaver')
 
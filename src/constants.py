@@ -7,6 +7,40 @@ UNLOCK_TIMEOUT = 30
 # after an idle-activation is canceled.
 GRAB_RELEASE_TIMEOUT = 1 * 1000
 
+# Time in seconds we wait after deactivating (or starting up) before trimming
+# our memory use, in resident mode.
+MEMORY_TRIM_DELAY = 10
+
+# Stage refreshes (for screen and monitor changes) wait until things have been quiet for
+# REFRESH_SETTLE_TIME ms, but no more than REFRESH_MAX_DELAY ms after the first request, and
+# are spaced at least REFRESH_MIN_INTERVAL ms apart.  Hotplugging a monitor, or docking,
+# can produce a burst of changes - this lets us handle them all with a single refresh.
+REFRESH_SETTLE_TIME = 250
+REFRESH_MAX_DELAY = 1000
+REFRESH_MIN_INTERVAL = 500
+
+# Time in ms to wait after a background setting changes before reloading the background, so
+# that changing several at once (which is how the wallpaper is usually changed) is one reload.
+BG_RELOAD_DELAY = 100
+
+# The most memory (in bytes) the wallpaper cache can keep rendered backgrounds in.  This is enough
+# for a few 4K monitors' worth.
+WALLPAPER_CACHE_SIZE = 128 * 1024 * 1024
+
+# The most disk space (in bytes) used to keep rendered wallpapers between runs.
+WALLPAPER_DISK_CACHE_SIZE = 256 * 1024 * 1024
+
+# How much our wallpapers are darkened (the alpha of the black shade rendered over them.)
+WALLPAPER_SHADE_ALPHA = 0.7
+
+# Wallpaper changes are only crossfaded if blending every monitor at once means blending
+# no more than this many pixels per frame (about two 1440p monitors) - otherwise the new
+# wallpaper replaces the old one immediately.
+WALLPAPER_CROSSFADE_MAX_PIXELS = 2 * 2560 * 1440
+
+# The number of threads used to render wallpapers (one per monitor, up to this many, are rendered at once.)
+WALLPAPER_RENDER_THREADS = 4
+
 # Used by powerWidget - the level a battery must be below before the battery icon widget in the infopanel
 # will show even when asleep (active but not awake.)
 BATTERY_CRITICAL_PERCENT = 20
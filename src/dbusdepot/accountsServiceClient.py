@@ -5,9 +5,10 @@ from gi.repository import GObject, CScreensaver, Gio, GLib
 import os
 import time
 
-from util import utils, trackers
+from util import utils, trackers, snapshot
+from dbusdepot.clientRegistry import ClientStartup
 
-class AccountsServiceClient(GObject.Object):
+class AccountsServiceClient(GObject.Object, ClientStartup):
     """
     Singleton for working with the AccountsService, which we use
     to retrieve the user's face image and their real name.
@@ -25,6 +26,9 @@ class AccountsServiceClient(GObject.Object):
         self.accounts = None
         self.user = None
 
+        # Until AccountsService gets back to us, use what it told us last time.
+        self.cached = snapshot.lookup("accounts", utils.get_user_name()) or {}
+
         print("Loading AccountsService")
 
         CScreensaver.AccountsServiceProxy.new_for_bus(Gio.BusType.SYSTEM,
@@ -39,6 +43,7 @@ class AccountsServiceClient(GObject.Object):
             self.accounts = CScreensaver.AccountsServiceProxy.new_for_bus_finish(res)
         except GLib.Error as e:
             print(f"Could not connect to AccountsService: {e}", flush=True)
+            self.startup_finished(False)
             return
 
         self.accounts.call_find_user_by_name(utils.get_user_name(), None, self.got_user_proxy)
@@ -48,6 +53,7 @@ class AccountsServiceClient(GObject.Object):
             proxy_path = self.accounts.call_find_user_by_name_finish(res)
         except GLib.Error as e:
             print(f"Could not get AccountsService User object path: {e}", flush=True)
+            self.startup_finished(False)
             return
 
         CScreensaver.AccountsUserProxy.new_for_bus(Gio.BusType.SYSTEM,
@@ -63,14 +69,21 @@ class AccountsServiceClient(GObject.Object):
         except GLib.Error as e:
             print(f"Could not create AccountsService.User: {e}", flush=True)
 
+        if self.user is not None:
+            snapshot.store("accounts",
+                           utils.get_user_name(),
+                           { "real_name": self.user.get_property("real-name"),
+                             "icon_file": self.user.get_property("icon-file") })
+
         print("AccountsService ready")
+        self.startup_finished(self.user is not None)
         self.emit("accounts-ready")
 
     def get_real_name(self):
         if self.user is not None:
             return self.user.get_property("real-name")
 
-        return None
+        return self.cached.get("real_name")
 
     def get_face_path(self):
         face = os.path.join(GLib.get_home_dir(), ".face")
@@ -79,7 +92,10 @@ class AccountsServiceClient(GObject.Object):
 
         if self.user is not None:
             accounts_path = self.user.get_property("icon-file")
-            if os.path.exists(accounts_path):
-                    return accounts_path
+        else:
+            accounts_path = self.cached.get("icon_file")
+
+        if accounts_path and os.path.exists(accounts_path):
+            return accounts_path
 
         return None
@@ -2,7 +2,9 @@
 
 from gi.repository import Gio, GObject, GLib
 
-class BaseClient(GObject.GObject):
+from dbusdepot.clientRegistry import ClientStartup
+
+class BaseClient(GObject.GObject, ClientStartup):
     """
     The base constructor for all of our generated GDBusProxies.
 
@@ -36,7 +38,7 @@ class BaseClient(GObject.GObject):
                                                 service,
                                                 Gio.BusNameWatcherFlags.NONE,
                                                 self._on_appeared,
-                                                self.on_failure)
+                                                self._on_vanished)
 
     def _on_appeared(self, connection, name, name_owner, data=None):
         try:
@@ -48,14 +50,26 @@ class BaseClient(GObject.GObject):
                                  self._on_proxy_ready)
         except GLib.Error:
             self.proxy = None
+            self.startup_finished(False)
             self.on_failure()
 
         Gio.bus_unwatch_name(self.watch_name_id)
 
+    def _on_vanished(self, *args):
+        self.startup_finished(False)
+        self.on_failure(*args)
+
     def _on_proxy_ready(self, object, result, data=None):
-        self.proxy = self.proxy_class.new_finish(result)
+        try:
+            self.proxy = self.proxy_class.new_finish(result)
+        except GLib.Error:
+            self.proxy = None
+            self.startup_finished(False)
+            self.on_failure()
+            return
 
         self.on_client_setup_complete()
+        self.startup_finished(True)
 
     def ensure_proxy_alive(self):
         """
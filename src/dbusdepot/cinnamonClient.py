@@ -3,7 +3,7 @@
 from gi.repository import Gio, CScreensaver, GObject
 
 from dbusdepot.baseClient import BaseClient
-from util import trackers
+from util import trackers, utils, snapshot
 
 # see cinnamon/files/usr/share/cinnamon/cinnamon-settings/bin/InputSources.py
 class CurrentInputSource:
@@ -36,6 +36,12 @@ class CinnamonClient(BaseClient):
                                              self.CINNAMON_PATH)
         self.sources = []
 
+        # Use the input sources we had last time until Cinnamon gives us the current ones.
+        cached = snapshot.lookup("input-sources", utils.get_user_name())
+
+        if cached is not None:
+            self.sources = [CurrentInputSource(source) for source in cached]
+
     def on_client_setup_complete(self):
         trackers.con_tracker_get().connect(self.proxy, "g-signal", self.on_cinnamon_signal)
         self.update_layout_sources()
@@ -52,11 +58,16 @@ class CinnamonClient(BaseClient):
 
     def get_input_sources_callback(self, proxy, sources, data=None):
         self.sources = []
+        xkb_sources = []
 
         for source in sources:
             input_source = CurrentInputSource(source)
             if input_source.type == "xkb":
                 self.sources.append(input_source)
+                xkb_sources.append(source)
+
+        snapshot.store("input-sources", utils.get_user_name(), xkb_sources)
+
         self.emit("input-sources-changed")
 
     def get_input_sources_error(self, proxy, error, data=None):
@@ -77,9 +88,13 @@ class CinnamonClient(BaseClient):
         return None
 
     def activate_layout_index(self, index):
-        self.proxy.ActivateInputSourceIndex("(i)", index)
+        if self.ensure_proxy_alive():
+            self.proxy.ActivateInputSourceIndex("(i)", index)
 
     def activate_next_layout(self):
+        if not self.ensure_proxy_alive():
+            return
+
         current = 0
 
         for i in range(0, len(self.sources)):
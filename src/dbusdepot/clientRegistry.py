@@ -0,0 +1,128 @@
+#!/usr/bin/python3
+
+import time
+
+from util import trackers
+from util.utils import DEBUG
+
+class ClientStartup:
+    """
+    Mixin for our clients - each calls startup_finished() once it has either connected
+    or given up, which is how the ClientRegistry knows it's ready.
+    """
+    startup_complete = False
+    startup_succeeded = False
+    _startup_callback = None
+
+    def startup_finished(self, success):
+        if self.startup_complete:
+            return
+
+        self.startup_complete = True
+        self.startup_succeeded = success
+
+        if self._startup_callback is not None:
+            self._startup_callback(self, success)
+
+class ClientRegistry:
+    """
+    Keeps track of our dbus clients while they connect.
+
+    All of the clients connect asynchronously, so they're all started at once and
+    none of them hold up startup.  Anything that can't proceed without a particular
+    client (like starting the event filter, which needs to know if fractional scaling
+    is in use) uses call_when_ready() to wait for only the clients it needs.
+    """
+    def __init__(self):
+        self.clients = {}
+        self.start_times = {}
+        self.start_time = time.monotonic()
+        self.all_finished = False
+
+        self.waiters = {}
+        self.next_waiter_id = 1
+
+    def add(self, name, client_type):
+        """
+        Constructs a client of client_type, adds it and returns it.  The client is timed
+        from before it's constructed, as some can finish right away (MuffinClient, if it
+        can use the snapshot).
+        """
+        self.start_times[name] = time.monotonic()
+        self.all_finished = False
+
+        client = client_type()
+        self.clients[name] = client
+
+        if client.startup_complete:
+            self.on_client_finished(name, client.startup_succeeded)
+        else:
+            client._startup_callback = lambda client, success: self.on_client_finished(name, success)
+
+        return client
+
+    def is_ready(self, names):
+        for name in names:
+            if not self.clients[name].startup_complete:
+                return False
+
+        return True
+
+    def call_when_ready(self, names, callback, timeout=500):
+        """
+        Calls callback once each of the named clients has either connected or failed
+        to, or after timeout milliseconds, whichever comes first.  If they're all ready
+        already, callback is called immediately, and 0 is returned.  Otherwise, this
+        returns an id that can be passed to cancel().
+        """
+        if self.is_ready(names):
+            callback()
+            return 0
+
+        waiter_id = self.next_waiter_id
+        self.next_waiter_id += 1
+
+        self.waiters[waiter_id] = (names, callback)
+
+        DEBUG("clients: waiting on %s" % ", ".join(name for name in names if not self.clients[name].startup_complete))
+
+        trackers.timer_tracker_get().start("client-registry-wait-%d" % waiter_id,
+                                           timeout,
+                                           self.on_waiter_timeout,
+                                           waiter_id)
+
+        return waiter_id
+
+    def cancel(self, waiter_id):
+        if waiter_id in self.waiters:
+            del self.waiters[waiter_id]
+            trackers.timer_tracker_get().cancel("client-registry-wait-%d" % waiter_id)
+
+    def on_waiter_timeout(self, waiter_id):
+        names, callback = self.waiters[waiter_id]
+
+        DEBUG("clients: gave up waiting on %s" % ", ".join(name for name in names if not self.clients[name].startup_complete))
+
+        self.run_waiter(waiter_id)
+        return False
+
+    def run_waiter(self, waiter_id):
+        names, callback = self.waiters.pop(waiter_id)
+        trackers.timer_tracker_get().cancel("client-registry-wait-%d" % waiter_id)
+
+        callback()
+
+    def on_client_finished(self, name, success):
+        DEBUG("clients: %s %s after %.1f ms" % (name,
+                                                "connected" if success else "failed to connect",
+                                                (time.monotonic() - self.start_times[name]) * 1000.0))
+
+        for waiter_id, (names, callback) in list(self.waiters.items()):
+            if name in names and self.is_ready(names):
+                self.run_waiter(waiter_id)
+
+        if not self.all_finished and self.is_ready(self.clients.keys()):
+            self.all_finished = True
+
+            DEBUG("clients: all %d clients finished starting up after %.1f ms" % (len(self.clients),
+                                                                                 (time.monotonic() - self.start_time) * 1000.0))
@@ -31,16 +31,19 @@ class ConsoleKitClient(LoginInterface, BaseClient):
         If our manager connection succeeds, we ask it for the current session id and
         then attempt to connect to its session interface.
         """
-        self.session_id = self.proxy.call_get_current_session_sync()
+        self.proxy.call_get_current_session(None, self.on_current_session_read)
 
+    def on_current_session_read(self, proxy, res, data=None):
         try:
-            self.session_proxy = CScreensaver.ConsoleKitSessionProxy.new_for_bus(Gio.BusType.SYSTEM,
-                                                                                 Gio.DBusProxyFlags.NONE,
-                                                                                 self.CK_SERVICE,
-                                                                                 self.session_id,
-                                                                                 None,
-                                                                                 self.on_session_ready,
-                                                                                 None)
+            self.session_id = self.proxy.call_get_current_session_finish(res)
+
+            CScreensaver.ConsoleKitSessionProxy.new_for_bus(Gio.BusType.SYSTEM,
+                                                            Gio.DBusProxyFlags.NONE,
+                                                            self.CK_SERVICE,
+                                                            self.session_id,
+                                                            None,
+                                                            self.on_session_ready,
+                                                            None)
         except GLib.Error:
             self.session_proxy = None
             self.on_failure()
@@ -2,7 +2,6 @@
 
 from gi.repository import Gio, GLib, CScreensaver
 import os
-import subprocess
 
 import status
 from dbusdepot.baseClient import BaseClient
@@ -29,22 +28,43 @@ class LogindClient(LoginInterface, BaseClient):
 
         self.pid = os.getpid()
 
+        self.current_user = None
+        self.current_session_id = None
         self.session_path = None
         self.session_proxy = None
 
     def on_client_setup_complete(self):
         """
         If our manager connection succeeds, we get the current session path and attempt
-        to connect to its interface.
+        to connect to its interface.  Each step is asynchronous, so the rest of our clients
+        can go on connecting meanwhile.
         """
+        self.current_user = GLib.get_user_name()
+
+        try:
+            proc = Gio.Subprocess.new(["loginctl", "show-user", self.current_user, "-pDisplay", "--value"],
+                                      Gio.SubprocessFlags.STDOUT_PIPE)
+            proc.communicate_utf8_async(None, None, self.on_session_id_read)
+        except GLib.Error as e:
+            print("login client: could not run loginctl: %s" % e, flush=True)
+            self.on_failure()
+
+    def on_session_id_read(self, proc, res, data=None):
         try:
-            current_user = GLib.get_user_name()
+            success, stdout, stderr = proc.communicate_utf8_finish(res)
+        except GLib.Error as e:
+            print("login client: could not read the current session from loginctl: %s" % e, flush=True)
+            self.on_failure()
+            return
 
-            cmd = "loginctl show-user %s -pDisplay --value" % current_user
-            current_session_id = subprocess.check_output(cmd, shell=True).decode().replace("\n", "")
+        self.current_session_id = stdout.replace("\n", "")
 
-            self.session_path = self.proxy.call_get_session_sync(current_session_id, None)
-            DEBUG("login client: found session path for user '%s' (session_id: %s): %s" % (current_user, current_session_id, self.session_path))
+        self.proxy.call_get_session(self.current_session_id, None, self.on_session_path_read)
+
+    def on_session_path_read(self, proxy, res, data=None):
+        try:
+            self.session_path = self.proxy.call_get_session_finish(res)
+            DEBUG("login client: found session path for user '%s' (session_id: %s): %s" % (self.current_user, self.current_session_id, self.session_path))
         except GLib.Error as e:
             print("login client: could not get session path: %s" % e, flush=True)
             self.on_failure()
@@ -4,6 +4,7 @@ from gi.repository import Gio, GLib, CScreensaver, GObject
 from enum import IntEnum
 
 from dbusdepot.baseClient import BaseClient
+from dbusdepot.clientRegistry import ClientStartup
 from util import trackers
 
 class PlaybackStatus(IntEnum):
@@ -135,6 +136,21 @@ class MprisClient(BaseClient):
     def on_failure(self, *args):
         pass
 
+    def release(self):
+        """
+        Disconnects from our proxy, so we can be freed.
+        """
+        if self.proxy is None:
+            return
+
+        trackers.con_tracker_get().disconnect(self.proxy,
+                                              "notify::playback-status",
+                                              self.on_playback_status_changed)
+
+        trackers.con_tracker_get().disconnect(self.proxy,
+                                              "notify::metadata",
+                                              self.on_metadata_changed)
+
     def return_best_string(self, item):
         if type(item) == list:
             return ", ".join(item)
@@ -175,7 +191,7 @@ class MprisClient(BaseClient):
         self.ensure_metadata()
         self.emit("metadata-changed")
 
-class MediaPlayerWatcher(GObject.Object):
+class MediaPlayerWatcher(GObject.Object, ClientStartup):
     """
     Media player interfaces are different from our other interfaces.
     There is no common owned name, players export their own unique interface,
@@ -188,29 +204,39 @@ class MediaPlayerWatcher(GObject.Object):
 
     def __init__(self):
         """
-        Connect to the bus and retrieve a list of interfaces.
+        Connect to the bus (asynchronously) and retrieve a list of interfaces.
         """
         super(MediaPlayerWatcher, self).__init__()
 
         self.player_clients = []
-
+        self.players_released = False
+        self.dbus_proxy = None
+
+        Gio.DBusProxy.new_for_bus(Gio.BusType.SESSION,
+                                  Gio.DBusProxyFlags.NONE,
+                                  None,
+                                  "org.freedesktop.DBus",
+                                  "/org/freedesktop/DBus",
+                                  "org.freedesktop.DBus",
+                                  None,
+                                  self.on_dbus_proxy_ready,
+                                  None)
+
+    def on_dbus_proxy_ready(self, source, res, data=None):
         try:
-            self.dbus_proxy = Gio.DBusProxy.new_for_bus_sync(Gio.BusType.SESSION,
-                                                             Gio.DBusProxyFlags.NONE,
-                                                             None,
-                                                             "org.freedesktop.DBus",
-                                                             "/org/freedesktop/DBus",
-                                                             "org.freedesktop.DBus",
-                                                             None)
-
-            trackers.con_tracker_get().connect(self.dbus_proxy,
-                                               "g-signal",
-                                               self.on_dbus_proxy_signal)
-
-            self.find_initial_players()
+            self.dbus_proxy = Gio.DBusProxy.new_for_bus_finish(res)
         except GLib.Error:
             self.dbus_proxy = None
             print("Cannot acquire session org.freedesktop.DBus client to watch for media players")
+            self.startup_finished(False)
+            return
+
+        trackers.con_tracker_get().connect(self.dbus_proxy,
+                                           "g-signal",
+                                           self.on_dbus_proxy_signal)
+
+        self.find_initial_players()
+        self.startup_finished(True)
 
     def on_dbus_proxy_signal(self, proxy, sender, signal, parameters, data=None):
         """
@@ -242,6 +268,9 @@ class MediaPlayerWatcher(GObject.Object):
         """
         Create an mpris client for any discovered interfaces.
         """
+        if self.players_released:
+            return
+
         if name.startswith("org.mpris.MediaPlayer2."):
             self.player_clients.append(MprisClient(name, self.MPRIS_PATH))
 
@@ -258,6 +287,34 @@ class MediaPlayerWatcher(GObject.Object):
         if item:
             self.player_clients.remove(item)
 
+    def release_players(self):
+        """
+        Drops all of our player clients, and ignores new players until resume_players()
+        is called.  This is used in resident mode to trim our memory use while idle.
+        """
+        if self.players_released:
+            return
+
+        self.players_released = True
+
+        for client in self.player_clients:
+            client.release()
+
+        self.player_clients = []
+
+    def resume_players(self):
+        """
+        Starts tracking players again after release_players().  They're discovered
+        asynchronously, like at startup.
+        """
+        if not self.players_released:
+            return
+
+        self.players_released = False
+
+        if self.dbus_proxy is not None:
+            self.find_initial_players()
+
     def get_best_player(self):
         """
         Find the first player in our list that is playing, then for one
@@ -4,11 +4,14 @@ import gi
 gi.require_version('CScreensaver', '1.0')
 from gi.repository import GLib, Gio, GObject, CScreensaver
 
+from dbusdepot.clientRegistry import ClientStartup
+from util import snapshot
+
 # TODO
 # self.monitors, etc.. replace or at least prefer this over CsScreen, as it will be more accurate.
 # Nothing currently listens to muffin-config-changed. This class is only used to initialize the event filters.
 
-class MuffinClient(GObject.Object):
+class MuffinClient(GObject.Object, ClientStartup):
     MUFFIN_SERVICE = "org.cinnamon.Muffin.DisplayConfig"
     MUFFIN_PATH    = "/org/cinnamon/Muffin/DisplayConfig"
 
@@ -22,19 +25,36 @@ class MuffinClient(GObject.Object):
         self.proxy = None
         self.using_fractional_scaling = False
 
+        # We need to know the fractional scaling state before starting the event filter - the
+        # Stage waits for us (see ClientRegistry.call_when_ready()) if we're not ready yet.  If
+        # the monitors are the same as last time, we can use what Muffin told us then, and we're
+        # ready right away - if it turns out to be different now, muffin-config-changed is emitted.
+        cached = snapshot.lookup("fractional-scaling", snapshot.get_monitor_key())
+
+        if cached is not None:
+            self.using_fractional_scaling = cached
+            self.startup_finished(True)
+
+        CScreensaver.MuffinDisplayConfigProxy.new_for_bus(Gio.BusType.SESSION,
+                                                          Gio.DBusProxyFlags.DO_NOT_LOAD_PROPERTIES |
+                                                            Gio.DBusProxyFlags.DO_NOT_AUTO_START,
+                                                          self.MUFFIN_SERVICE,
+                                                          self.MUFFIN_PATH,
+                                                          None,
+                                                          self.on_proxy_ready)
+
+    def on_proxy_ready(self, source, res):
         try:
-            self.proxy = CScreensaver.MuffinDisplayConfigProxy.new_for_bus_sync(Gio.BusType.SESSION,
-                                                                                Gio.DBusProxyFlags.DO_NOT_LOAD_PROPERTIES |
-                                                                                  Gio.DBusProxyFlags.DO_NOT_AUTO_START,
-                                                                                self.MUFFIN_SERVICE,
-                                                                                self.MUFFIN_PATH,
-                                                                                None)
-            self.proxy.connect("monitors-changed", self.on_monitors_changed)
-            # cinnamon restart (monitors-changed isn't emitted at muffin startup)
-            self.proxy.connect("notify::g-name-owner", self.on_name_owner_changed)
-            self.update()
+            self.proxy = CScreensaver.MuffinDisplayConfigProxy.new_for_bus_finish(res)
         except GLib.Error as e:
             print(f"Could not connect to Muffin's DisplayConfig service: {e}", flush=True)
+            self.startup_finished(False)
+            return
+
+        self.proxy.connect("monitors-changed", self.on_monitors_changed)
+        # cinnamon restart (monitors-changed isn't emitted at muffin startup)
+        self.proxy.connect("notify::g-name-owner", self.on_name_owner_changed)
+        self.update()
 
     def on_monitors_changed(self, proxy):
         self.update()
@@ -44,24 +64,33 @@ class MuffinClient(GObject.Object):
             self.update()
 
     def update(self):
-        if self.read_current_state():
-            self.emit("muffin-config-changed")
-
-    def read_current_state(self, *args):
-        old_scaling = self.using_fractional_scaling
-
         if self.proxy.get_name_owner() is None:
             print("Muffin not running, skipping fractional scaling check.")
-            return False
+            self.startup_finished(False)
+            return
+
+        self.proxy.call_get_current_state(None, self.on_current_state_read)
+
+    def on_current_state_read(self, proxy, res):
+        old_scaling = self.using_fractional_scaling
 
         try:
-            logical_monitors = self.proxy.call_get_current_state_sync(None)[2]
+            logical_monitors = proxy.call_get_current_state_finish(res)[2]
         except GLib.Error as e:
             print(f"Could not read current state from Muffin: {e}", flush=True)
             self.using_fractional_scaling = False
-            return self.using_fractional_scaling != old_scaling
+        else:
+            self.using_fractional_scaling = self.check_fractional_scaling(logical_monitors)
+            print(f"Fractional scaling active: {self.using_fractional_scaling}", flush=True)
+
+            snapshot.store("fractional-scaling", snapshot.get_monitor_key(), self.using_fractional_scaling)
+
+        self.startup_finished(True)
+
+        if self.using_fractional_scaling != old_scaling:
+            self.emit("muffin-config-changed")
 
-        fractional = False
+    def check_fractional_scaling(self, logical_monitors):
         previous_scale = -1
 
         for monitor in logical_monitors.unpack():
@@ -69,19 +98,15 @@ class MuffinClient(GObject.Object):
 
             # one or more monitors using some non-integer scale.
             if int(scale) != scale:
-                fractional = True
-                break
+                return True
 
             # multiple monitors with non-identical scales
             if previous_scale > 0 and scale != previous_scale:
-                fractional = True
-                break
+                return True
 
             previous_scale = scale
 
-        self.using_fractional_scaling = fractional
-        print(f"Fractional scaling active: {self.using_fractional_scaling}", flush=True)
-        return self.using_fractional_scaling != old_scaling
+        return False
 
     def get_using_fractional_scaling(self):
         return self.using_fractional_scaling
@@ -36,3 +36,125 @@ class Floating:
     def set_awake_position(self, monitor):
         self.awake_position.monitor = monitor
         self.next_position = self.awake_position
+
+ALIGNMENTS = (Gtk.Align.START, Gtk.Align.CENTER, Gtk.Align.END)
+MAX_CACHED_ALLOCATIONS = 64
+
+class FloaterSlots:
+    """
+    Decides where our Floating widgets go.  Each monitor is divided into nine regions (a 3x3
+    grid) - a slot is one of these, described by (monitor, halign, valign).
+
+    The slots (and the geometry of their monitors) are worked out once for each monitor
+    layout, in update_layout().  rotate() gives each floater a new slot, never one another
+    floater has, or the one it's just left - slots are dealt from a shuffled deck, so every
+    slot is used before any is used again, which spreads them evenly over the screen.
+
+    get_allocation() returns where a floater of a given size goes in a slot, and remembers
+    it, so allocating the same floater in the same place doesn't need working out again.
+    """
+    def __init__(self):
+        self.monitor_rects = []
+        self.slots = []
+        self.deck = []
+        self.assigned = {}
+        self.allocations = {}
+
+    def update_layout(self):
+        monitor_rects = [status.screen.get_monitor_geometry(i) for i in range(status.screen.get_n_monitors())]
+
+        if [(r.x, r.y, r.width, r.height) for r in monitor_rects] == [(r.x, r.y, r.width, r.height) for r in self.monitor_rects]:
+            return
+
+        self.monitor_rects = monitor_rects
+        self.slots = [(monitor, halign, valign) for monitor in range(len(monitor_rects))
+                                                for halign in ALIGNMENTS
+                                                for valign in ALIGNMENTS]
+        self.deck = []
+        self.allocations = {}
+
+        # Floaters on a monitor that's gone will get a new slot on the next rotate().
+        self.assigned = dict((floater, slot) for floater, slot in self.assigned.items() if slot[0] < len(monitor_rects))
+
+    def get_monitor_rect(self, monitor):
+        if monitor >= len(self.monitor_rects):
+            # A monitor was added, and we haven't been refreshed yet.
+            self.update_layout()
+
+        return self.monitor_rects[monitor]
+
+    def rotate(self, floaters):
+        """
+        Gives each of floaters its next position.
+        """
+        taken = set()
+
+        for floater in floaters:
+            slot = self.deal(taken | {self.assigned.get(floater)})
+
+            self.assigned[floater] = slot
+            taken.add(slot)
+
+            floater.set_next_position(*slot)
+
+    def deal(self, exclude):
+        for attempt in range(2):
+            for i, slot in enumerate(self.deck):
+                if slot not in exclude:
+                    return self.deck.pop(i)
+
+            self.deck = list(self.slots)
+            random.shuffle(self.deck)
+
+        # More floaters than slots - nine per monitor should be plenty.
+        return random.choice(self.slots)
+
+    def get_allocation(self, monitor, halign, valign, width, height, region_width=None):
+        """
+        Returns the (x, y, width, height) of a floater wanting width x height, in the given slot.
+        Floaters are limited to the size of a region, and centered in theirs (by default a
+        third of the monitor in each direction - this can be narrowed with region_width.)
+        """
+        key = (monitor, halign, valign, width, height, region_width)
+
+        try:
+            return self.allocations[key]
+        except KeyError:
+            pass
+
+        monitor_rect = self.get_monitor_rect(monitor)
+
+        region_w = monitor_rect.width / 3 if region_width is None else region_width
+        region_h = monitor_rect.height / 3
+
+        # Restrict the widget size to the allowable region sizes if necessary.
+        alloc_w = min(width, region_w)
+        alloc_h = min(height, region_h)
+
+        # Calculate padding required to center widgets within their particular 1/9th of the monitor
+        padding_x = (region_w - alloc_w) / 2
+        padding_y = (region_h - alloc_h) / 2
+
+        if halign == Gtk.Align.START:
+            x = monitor_rect.x + padding_x
+        elif halign == Gtk.Align.END:
+            x = monitor_rect.x + monitor_rect.width - alloc_w - padding_x
+        else:
+            x = monitor_rect.x + (monitor_rect.width / 2) - (alloc_w / 2)
+
+        if valign == Gtk.Align.START:
+            y = monitor_rect.y + padding_y
+        elif valign == Gtk.Align.END:
+            y = monitor_rect.y + monitor_rect.height - alloc_h - padding_y
+        else:
+            y = monitor_rect.y + (monitor_rect.height / 2) - (alloc_h / 2)
+
+        allocation = (int(x), int(y), int(alloc_w), int(alloc_h))
+
+        # Widget sizes change now and then (the clock's text, new album art), don't keep old ones forever.
+        if len(self.allocations) >= MAX_CACHED_ALLOCATIONS:
+            self.allocations = {}
+
+        self.allocations[key] = allocation
+
+        return allocation
@@ -60,6 +60,13 @@ class InfoPanel(BaseWindow):
     def on_power_state_changed(self, obj):
         self.update_visibility()
 
+    def reset_notifications(self):
+        """
+        Forgets the notifications counted so far - see Stage.restore().
+        """
+        self.notification_widget.reset()
+        self.update_visibility()
+
     def update_visibility(self):
         """
         Determines whether or not to show the panel, depending on:
@@ -11,9 +11,8 @@ import config
 import constants as c
 import status
 
-from stage import Stage
 import singletons
-from util import utils, settings, trackers
+from util import utils, settings, trackers, timing, startupProfile, memory
 from util.focusNavigator import FocusNavigator
 from util.utils import DEBUG
 
@@ -33,13 +32,18 @@ class ScreensaverManager(GObject.Object):
 
         self.stage = None
         self.old_stage = None
+        self.retained_stage = None
         self.stage_refresh_id = 0
         self.refreshing = False
-        self.refresh_again = False
+        self.refresh_causes = set()
+        self.refresh_pending_since = 0
+        self.last_refresh_time = 0
 
         self.fb_pid = 0
         self.fb_failed_to_start = False
 
+        self.grab_helper = None
+
         # Ensure our state
         status.Active = False
         status.Locked = False
@@ -54,7 +58,46 @@ class ScreensaverManager(GObject.Object):
 
         self.cinnamon_client = singletons.CinnamonClient
 
-        singletons.LoginClientResolver(self)
+        singletons.LoginClient.set_manager(self)
+
+        # The Stage brings in every widget module and most of our typelibs - load it once
+        # startup has finished, rather than as part of it, or on the first activation.
+        GLib.idle_add(self.prefetch_stage, priority=GLib.PRIORITY_LOW)
+
+        if status.Resident:
+            self.queue_trim_memory()
+
+    def prefetch_stage(self):
+        """
+        Import the Stage module (and with it, the rest of the lock screen), and load our
+        backgrounds, ahead of the first activation.  If an activation comes first,
+        spawn_stage() does this instead.
+        """
+        with timing.phase("import_stage"):
+            import stage
+
+        with timing.phase("setup_backgrounds"):
+            singletons.setup_backgrounds()
+
+        self.setup_screen()
+
+        startupProfile.report("lock screen modules loaded")
+
+        return False
+
+    def setup_screen(self):
+        """
+        Create our CsScreen and EventGrabber.  These are kept for as long as we're running -
+        the screen keeps its monitor information up to date as the layout changes (from
+        GdkScreen's monitors-changed and size-changed signals), so activating only needs
+        to read it, rather than query the X server for it all again.
+        """
+        if self.grab_helper is None:
+            self.grab_helper = CScreensaver.EventGrabber.new(status.Debug)
+
+        if status.screen is None:
+            with timing.phase("screen_new"):
+                status.screen = CScreensaver.Screen.new(status.Debug)
 
     def is_locked(self):
         """
@@ -104,6 +147,7 @@ class ScreensaverManager(GObject.Object):
         self.set_locked(False)
         status.Awake = False
 
+    @timing.traced
     def set_active(self, active, msg=None):
         """
         Activates or deactivates the screensaver.  Activation involves:
@@ -118,20 +162,28 @@ class ScreensaverManager(GObject.Object):
         """
         if active:
             if not status.Active:
+                trackers.timer_tracker_get().cancel("trim-memory")
+                singletons.MediaPlayerWatcher.resume_players()
+
                 self.cinnamon_client.exit_expo_and_overview()
-                self.grab_helper = CScreensaver.EventGrabber.new(status.Debug)
-                status.screen = CScreensaver.Screen.new(status.Debug)
+                self.setup_screen()
+
+                with timing.phase("grab_root"):
+                    grabbed = self.grab_helper.grab_root(False)
 
-                if self.grab_helper.grab_root(False):
+                if grabbed:
                     if not self.stage:
                         Gio.Application.get_default().hold()
-                        self.spawn_stage(msg, self.on_spawn_stage_complete)
+                        if not self.restore_retained_stage(msg, self.on_spawn_stage_complete):
+                            self.spawn_stage(msg, self.on_spawn_stage_complete)
                     else:
                         self.stage.activate(self.on_spawn_stage_complete)
                         self.stage.set_message(msg)
                     return True
                 else:
                     status.Active = False
+                    timing.cancel("lock")
+                    timing.cancel("set_active")
                     return False
             else:
                 self.stage.set_message(msg)
@@ -142,7 +194,6 @@ class ScreensaverManager(GObject.Object):
                 self.despawn_stage()
                 Gio.Application.get_default().release()
                 status.focusWidgets = []
-            status.screen = None
             return True
 
     def get_active(self):
@@ -206,13 +257,23 @@ class ScreensaverManager(GObject.Object):
 
         return False
 
+    @timing.traced
     def spawn_stage(self, away_message, callback=None):
         """
         Create the Stage and begin fading it in.  This may run quickly, in the case of
         user-initiated activation, or slowly, when the session has gone idle.
+
+        Returns False if the Stage couldn't be created.
         """
         try:
-            self.stage = Stage(self, away_message)
+            with timing.phase("import_stage"):
+                from stage import Stage
+
+            with timing.phase("setup_backgrounds"):
+                singletons.setup_backgrounds()
+
+            with timing.phase("stage_init"):
+                self.stage = Stage(self, away_message)
             self.stage.activate(callback)
         except Exception:
             print("Could not spawn screensaver stage:\n")
@@ -220,6 +281,53 @@ class ScreensaverManager(GObject.Object):
             self.grab_helper.release()
             status.Active = False
             self.cancel_timers()
+            return False
+
+        return True
+
+    def retain_stage(self):
+        """
+        Hide and reset the current Stage and hang onto it, rather than destroying it.  It
+        will be re-used by the next activation, as long as it's still valid by then.
+        """
+        DEBUG("manager: retaining stage for the next activation")
+
+        self.stage.retain()
+        self.retained_stage = self.stage
+
+    def restore_retained_stage(self, away_message, callback=None):
+        """
+        Re-use a retained Stage if we have one, and nothing has changed (monitors,
+        backgrounds, screensaver settings) that would require building a new one.
+
+        Returns True if the retained Stage is being activated, False if a new Stage
+        needs to be spawned.
+        """
+        stage = self.retained_stage
+        self.retained_stage = None
+
+        if stage is None:
+            return False
+
+        if not stage.can_restore():
+            DEBUG("manager: retained stage is no longer valid, discarding it")
+            stage.destroy_stage()
+            return False
+
+        DEBUG("manager: restoring retained stage")
+
+        try:
+            self.stage = stage
+            self.stage.restore(away_message)
+            self.stage.activate(callback)
+        except Exception:
+            print("Could not restore retained screensaver stage, building a new one:\n")
+            traceback.print_exc()
+            self.stage = None
+            stage.destroy_stage()
+            return False
+
+        return True
 
     def spawn_fallback_window(self):
         if self.fb_pid > 0:
@@ -337,7 +445,9 @@ class ScreensaverManager(GObject.Object):
         by our ConsoleKit client if we're using it, and our own ScreensaverService.)
         """
         self.grab_stage()
-        self.stage.connect("needs-refresh", self.queue_refresh_stage)
+        trackers.con_tracker_get().connect(self.stage,
+                                           "needs-refresh",
+                                           self.queue_refresh_stage)
         if self.old_stage:
             self.old_stage.hide()
             self.old_stage.destroy_stage()
@@ -350,9 +460,10 @@ class ScreensaverManager(GObject.Object):
 
         self.start_timers()
 
+    @timing.traced
     def despawn_stage(self):
         """
-        The stage is destroyed, our status
+        The stage is destroyed (or retained, if status.RetainStage is set), our status
         is updated, timer is canceled and active-changed is fired.
         """
         self.stage.cancel_unlocking()
@@ -365,8 +476,13 @@ class ScreensaverManager(GObject.Object):
             self.emit("active-changed", False)
 
         self.cancel_timers()
+        self.cancel_queued_refresh()
+
+        if status.RetainStage:
+            self.retain_stage()
+        else:
+            self.stage.destroy_stage()
 
-        self.stage.destroy_stage()
         self.stage = None
 
         # Ideal time to check for leaking connections that might prevent GC by python and gobject
@@ -374,6 +490,70 @@ class ScreensaverManager(GObject.Object):
             trackers.con_tracker_get().dump_connections_list()
             trackers.timer_tracker_get().dump_timer_list()
 
+        if timing.Tracing:
+            timing.flush_trace()
+
+        if status.Resident:
+            self.queue_trim_memory()
+
+    def queue_trim_memory(self):
+        trackers.timer_tracker_get().start_seconds("trim-memory",
+                                                   c.MEMORY_TRIM_DELAY,
+                                                   self.trim_memory)
+
+    def trim_memory(self):
+        """
+        In resident mode (--resident), we stay running between activations rather than exiting
+        when idle, so the next activation doesn't need to start from scratch.  To keep the cost
+        of that down, we give back whatever we can a little while after each deactivation:
+
+            - a retained Stage drops its wallpapers and closes its mixer connection.
+            - garbage is collected, and free heap memory is returned to the system.
+
+        If there's a memory budget (--memory-budget) and we're still over it, the retained Stage
+        (if any) is destroyed, cached wallpapers are dropped, media player clients are released
+        until the next activation, and we try again.  If even that isn't enough, we give up on
+        staying resident, and drop the hold resident mode keeps on the application - unless
+        --hold was also given, we'll exit when idle like we would normally.
+        """
+        if status.Active:
+            return False
+
+        before = memory.get_rss()
+
+        if self.retained_stage is not None:
+            self.retained_stage.trim_memory()
+
+        rss = memory.trim(status.FreezeGC)
+
+        if status.MemoryBudget > 0 and rss > status.MemoryBudget:
+            DEBUG("manager: idle memory use (%s) is over budget, releasing the retained stage and media players" % memory.format_size(rss))
+
+            if self.retained_stage is not None:
+                self.retained_stage.destroy_stage()
+                self.retained_stage = None
+
+            if singletons.WallpaperCache is not None:
+                singletons.WallpaperCache.clear()
+            singletons.MediaPlayerWatcher.release_players()
+
+            rss = memory.trim(status.FreezeGC)
+
+        DEBUG("manager: trimmed idle memory use from %s to %s" % (memory.format_size(before), memory.format_size(rss)))
+
+        if status.MemoryBudget > 0:
+            print("Idle memory footprint: %s (budget: %s)" % (memory.format_size(rss), memory.format_size(status.MemoryBudget)), flush=True)
+        else:
+            print("Idle memory footprint: %s" % memory.format_size(rss), flush=True)
+
+        if status.MemoryBudget > 0 and rss > status.MemoryBudget:
+            print("Unable to stay within the memory budget, leaving resident mode.", flush=True)
+
+            status.Resident = False
+            Gio.Application.get_default().release()
+
+        return False
+
     def grab_stage(self):
         """
         Makes a hard grab on the Stage window, all keyboard and mouse events are dispatched or eaten
@@ -382,31 +562,80 @@ class ScreensaverManager(GObject.Object):
         if self.stage is not None:
             self.grab_helper.move_to_window(self.stage.get_window(), Gdk.Screen.get_default(),  True)
 
-    def queue_refresh_stage(self, stage):
+    def queue_refresh_stage(self, stage=None, cause="unknown"):
         """
-        Queues a complete refresh of the stage, resizing the screen if necessary,
-        reconstructing the individual monitor objects, etc...
+        Queues a refresh of the stage, resizing the screen if necessary, updating the
+        individual monitor objects, etc...
+
+        Screen changes tend to arrive in bursts (a dock or undock can produce several
+        size-changed, monitors-changed and composited-changed signals), so we wait for them to
+        settle (REFRESH_SETTLE_TIME) and handle all of them with a single refresh.  We don't
+        wait indefinitely if they keep coming (REFRESH_MAX_DELAY), and refreshes are never run
+        closer together than REFRESH_MIN_INTERVAL.
         """
+        now = time.monotonic()
+
+        timing.count("refresh_requested")
+        self.refresh_causes.add(cause)
+
+        if self.refresh_pending_since == 0:
+            self.refresh_pending_since = now
+
+        due = min(now + c.REFRESH_SETTLE_TIME / 1000.0,
+                  self.refresh_pending_since + c.REFRESH_MAX_DELAY / 1000.0)
+        due = max(due, self.last_refresh_time + c.REFRESH_MIN_INTERVAL / 1000.0)
+
+        DEBUG("manager: queuing stage refresh (%s), due in %d ms" % (cause, (due - now) * 1000))
+
         if self.stage_refresh_id > 0:
             GObject.source_remove(self.stage_refresh_id)
-            self.stage_refresh_id = 0
 
-        DEBUG("manager: queuing stage refresh")
+        self.stage_refresh_id = GLib.timeout_add(max(0, int((due - now) * 1000)), self._update_full_stage_on_idle)
 
-        # self.stage_refresh_id = GLib.timeout_add_seconds(3, self._update_full_stage_on_idle, priority=GLib.PRIORITY_DEFAULT)
-        self.stage_refresh_id = GLib.idle_add(self._update_full_stage_on_idle, priority=GLib.PRIORITY_DEFAULT)
+    def cancel_queued_refresh(self):
+        if self.stage_refresh_id > 0:
+            GObject.source_remove(self.stage_refresh_id)
+            self.stage_refresh_id = 0
+
+        self.refresh_causes = set()
+        self.refresh_pending_since = 0
 
     def _update_full_stage_on_idle(self, data=None):
         self.stage_refresh_id = 0
 
+        # A rebuild is still in progress - stage_refreshed() will queue us again.
         if self.refreshing:
-            self.refresh_again = True
-            return
+            return False
+
+        causes = ", ".join(sorted(self.refresh_causes))
+        self.refresh_causes = set()
+        self.refresh_pending_since = 0
+
+        if self.stage is None:
+            return False
+
+        self.last_refresh_time = time.monotonic()
+
+        executed = timing.count("refresh_executed")
+
+        DEBUG("manager: refreshing stage for: %s (%d requested, %d executed)" % (causes,
+                                                                                timing.get_count("refresh_requested"),
+                                                                                executed))
 
         Gdk.flush()
 
         self.refreshing = True
-        self.refresh_stage()
+
+        try:
+            refreshing = self.refresh_stage()
+        except Exception:
+            print("Could not refresh screensaver stage:\n")
+            traceback.print_exc()
+            refreshing = False
+
+        # Nothing is left to call stage_refreshed().
+        if not refreshing:
+            self.refreshing = False
 
         return False
 
@@ -416,24 +645,35 @@ class ScreensaverManager(GObject.Object):
         self.grab_stage()
 
         self.refreshing = False
-        if self.refresh_again:
-            self.refresh_again = False
-
+        if self.refresh_causes and self.stage_refresh_id == 0:
             DEBUG("Got refresh signal while refreshing, doing it again.")
-            self.queue_refresh_stage()
+            self.queue_refresh_stage(cause="queued")
 
         self.simulate_user_activity()
 
+    @timing.traced
     def refresh_stage(self, stage=None):
         """
         Tells the stage to check its canvas size and make sure its windows are up-to-date.  This is called
         when our login manager tells us its "Active" property has changed.  We are always connected to the
         login manager, so we first check if we have a stage.
+
+        The Stage is updated in place if possible, keeping the unlock dialog (and anything the user has
+        typed) intact.  Otherwise, a new Stage is built to replace it.
+
+        Returns False if there was nothing to refresh, or the new Stage couldn't be built - in which case
+        stage_refreshed() won't be called.
         """
         if self.stage is None:
-            return
+            return False
 
-        DEBUG("Stage: refreshing")
+        if self.stage.refresh():
+            DEBUG("Stage: refreshed in place")
+            self.stage_refreshed()
+            return True
+
+        DEBUG("Stage: rebuilding")
+        timing.count("stage_rebuilt")
 
         self.stage.cancel_unlocking()
 
@@ -443,7 +683,12 @@ class ScreensaverManager(GObject.Object):
         away_message = self.stage.away_message
 
         self.old_stage = self.stage
-        self.spawn_stage(away_message, self.on_spawn_stage_complete)
+
+        if not self.spawn_stage(away_message, self.on_spawn_stage_complete):
+            print("Could not rebuild screensaver stage, stopping the refresh", flush=True)
+            return False
+
+        return True
 
     def start_timers(self):
         """
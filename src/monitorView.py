@@ -1,11 +1,12 @@
 #!/usr/bin/python3
 
-from gi.repository import Gtk, Gio, GLib, GObject
+from gi.repository import Gtk, Gdk, Gio, GLib
 import re
 import cairo
 import signal
 
 import status
+import constants as c
 from baseWindow import BaseWindow
 from util import settings, utils, trackers
 
@@ -17,6 +18,10 @@ class WallpaperStack(Gtk.Stack):
     image is requested, it is created and added to the stack, then
     a crossfade transition is made to the new child.  The former
     visible stack child is then destroyed.  And this repeats.
+
+    A crossfade blends two full-monitor images for every frame it runs, and keeps
+    both alive until it's done - if that would be too expensive (see should_crossfade()),
+    the new image simply replaces the old one.
     """
     def __init__(self):
         super(WallpaperStack, self).__init__()
@@ -28,29 +33,62 @@ class WallpaperStack(Gtk.Stack):
         self.current = None
         self.queued = None
 
+        self.timer_name = "wallpaper-transition-%d" % id(self)
+
     def transition_to_image(self, image):
         """
         Queues a new image in the stack, and begins the transition to it.
         """
+        # If we're still fading to the last one, skip to the end of that first.
+        if self.queued is not None:
+            self.visible_image_changed()
+
         self.queued = image
         self.queued.set_visible(True)
 
-        trackers.con_tracker_get().connect_after(image,
-                                                 "draw",
-                                                 self.shade_wallpaper)
-
         self.add(self.queued)
 
         if not self.initialized:
             self.visible_image_changed()
-            self.set_transition_type(Gtk.StackTransitionType.CROSSFADE)
             self.initialized = True
             return
 
+        if self.should_crossfade():
+            self.set_transition_type(Gtk.StackTransitionType.CROSSFADE)
+        else:
+            self.set_transition_type(Gtk.StackTransitionType.NONE)
+
         self.set_visible_child(self.queued)
-        GObject.timeout_add(2000, self.visible_image_changed)
+
+        if self.get_transition_running():
+            # The old image is freed as soon as the transition is over.
+            trackers.timer_tracker_get().start(self.timer_name,
+                                               self.get_transition_duration() + 100,
+                                               self.visible_image_changed)
+        else:
+            self.visible_image_changed()
+
+    def should_crossfade(self):
+        """
+        Crossfade only if there's a compositor (we take this to mean we're not stuck with
+        software rendering), and blending every monitor at once wouldn't cost too much.
+        """
+        if not self.get_screen().is_composited():
+            return False
+
+        pixels = 0
+
+        for i in range(status.screen.get_n_monitors()):
+            rect = status.screen.get_monitor_geometry(i)
+            pixels += rect.width * rect.height
+
+        scale = self.get_scale_factor()
+
+        return pixels * scale * scale <= c.WALLPAPER_CROSSFADE_MAX_PIXELS
 
     def visible_image_changed(self, data=None):
+        trackers.timer_tracker_get().cancel(self.timer_name)
+
         if self.current is not None:
             tmp = self.current
 
@@ -62,14 +100,47 @@ class WallpaperStack(Gtk.Stack):
 
         return False
 
-    def shade_wallpaper(self, widget, cr):
+    def clear(self):
         """
-        This draw callback adds a shade mask over the current
-        image.  It is uniform when not Awake, and acquires a
-        significant gradient vertically framing the unlock dialog
-        when Awake.
+        Destroys our images - the next one will be shown immediately, rather than faded in.
         """
-        cr.set_source_rgba(0.0, 0.0, 0.0, 0.7)
+        self.cancel_transition()
+
+        for image in (self.current, self.queued):
+            if image is not None:
+                self.remove(image)
+                image.destroy()
+
+        self.current = None
+        self.queued = None
+
+        self.set_transition_type(Gtk.StackTransitionType.NONE)
+        self.initialized = False
+
+    def cancel_transition(self):
+        trackers.timer_tracker_get().cancel(self.timer_name)
+
+class WallpaperPlaceholder(Gtk.DrawingArea):
+    """
+    Covers a monitor in the background's primary color (shaded like
+    our wallpapers are), until its wallpaper has been rendered.
+    """
+    def __init__(self):
+        super(WallpaperPlaceholder, self).__init__()
+
+        self.color = Gdk.RGBA()
+
+        if not self.color.parse(settings.bg_settings.get_string("primary-color")):
+            self.color.parse("black")
+
+        shade = 1.0 - c.WALLPAPER_SHADE_ALPHA
+
+        self.color.red *= shade
+        self.color.green *= shade
+        self.color.blue *= shade
+
+    def do_draw(self, cr):
+        Gdk.cairo_set_source_rgba(cr, self.color)
         cr.paint()
         return False
 
@@ -83,6 +154,16 @@ class MonitorView(BaseWindow):
 
         self.monitor_index = index
 
+        # Bumped with each wallpaper request, so only the latest one is shown.
+        self.wallpaper_serial = 0
+        self.shown_serial = 0
+
+        # The surface our wallpaper is taken from (which may be shared with other monitors),
+        # and its size in bytes.
+        self.wallpaper_surface = None
+        self.wallpaper_size = 0
+        self.wallpaper_layout = None
+
         self.update_geometry()
 
         self.wallpaper_stack = WallpaperStack()
@@ -91,7 +172,98 @@ class MonitorView(BaseWindow):
         self.wallpaper_stack.set_valign(Gtk.Align.FILL)
         self.add(self.wallpaper_stack)
 
+        trackers.con_tracker_get().connect(self,
+                                           "destroy",
+                                           self.on_destroy)
+
         self.show_all()
 
+    def update_geometry(self):
+        """
+        Override BaseWindow.update_geometry() - even when the background is spanned,
+        each monitor gets its own view, showing its part of the wallpaper.
+        """
+        self.rect = status.screen.get_monitor_geometry(self.monitor_index)
+
+    def get_wallpaper_rect(self):
+        """
+        Returns the area our wallpaper is rendered for - the entire screen, if it's spanned.
+        """
+        if status.Spanned:
+            return status.screen.get_screen_geometry()
+
+        return self.rect
+
+    def get_wallpaper_scale(self):
+        """
+        Returns the number of device pixels per application pixel.  Our wallpaper is rendered
+        at exactly that many pixels, with a matching cairo device scale, so drawing it never
+        involves any scaling.
+
+        With Muffin's fractional scaling, the X screen is rendered at the next whole scale up,
+        and scaled down by the server as it's displayed - so this is still a whole number, and
+        the same for every monitor.
+        """
+        return self.get_scale_factor()
+
+    def get_wallpaper_tile(self):
+        """
+        Returns the (x, y, width, height) part of the wallpaper we show, or None if we
+        show all of it.
+        """
+        if not status.Spanned:
+            return None
+
+        rect = self.get_wallpaper_rect()
+
+        return (self.rect.x - rect.x, self.rect.y - rect.y, self.rect.width, self.rect.height)
+
+    def get_wallpaper_layout(self):
+        """
+        Returns the size of the wallpaper we need, which part of it we show, and its scale -
+        if this changes, we need a new one.
+        """
+        rect = self.get_wallpaper_rect()
+
+        return (rect.width, rect.height, self.get_wallpaper_tile(), self.get_wallpaper_scale())
+
+    def set_wallpaper(self, surface, serial):
+        """
+        Shows surface (rendered for our part of the wallpaper) as our wallpaper.
+        """
+        self.wallpaper_surface = surface
+        scale = self.get_wallpaper_scale()
+
+        self.wallpaper_size = self.rect.width * self.rect.height * scale * scale * 4
+        self.shown_serial = serial
+
+        self.set_next_wallpaper_image(Gtk.Image.new_from_surface(surface))
+
+    def has_current_wallpaper(self):
+        return self.wallpaper_surface is not None and self.shown_serial == self.wallpaper_serial
+
     def set_next_wallpaper_image(self, image):
         self.wallpaper_stack.transition_to_image(image)
+
+    def show_placeholder(self):
+        """
+        Covers the monitor with a solid color, if there's no wallpaper showing yet.
+        """
+        if self.wallpaper_stack.initialized:
+            return
+
+        self.wallpaper_stack.transition_to_image(WallpaperPlaceholder())
+
+    def clear_wallpaper(self):
+        self.wallpaper_serial += 1
+        self.wallpaper_surface = None
+        self.wallpaper_stack.clear()
+
+    def on_destroy(self, widget, data=None):
+        # Any wallpaper still being rendered for us is no longer wanted.
+        self.wallpaper_serial += 1
+        self.wallpaper_stack.cancel_transition()
+
+        trackers.con_tracker_get().disconnect(self,
+                                              "destroy",
+                                              self.on_destroy)
@@ -166,6 +166,18 @@ class OnScreenKeyboard(BaseWindow):
         if settings.get_osk_a11y_active():
             self.build_and_show_keyboard()
 
+    def reset(self):
+        """
+        Puts the keyboard back the way it was constructed - hidden, and only expanded
+        if accessibility has the osk enabled.
+        """
+        self.hide()
+
+        if settings.get_osk_a11y_active():
+            self.build_and_show_keyboard()
+        else:
+            self.base_stack.set_visible_child_name("disabled")
+
     def on_activate_button_clicked(self, button, data=None):
         self.build_and_show_keyboard()
 
@@ -10,6 +10,7 @@ from gi.repository import Gio, GObject, GLib, CScreensaver
 
 import config
 import status
+from util import timing
 from util.utils import DEBUG
 
 class AuthClient(GObject.Object):
@@ -30,12 +31,16 @@ class AuthClient(GObject.Object):
         super(AuthClient, self).__init__()
         self.reset()
 
+    @timing.traced
     def initialize(self):
         if self.initialized:
             return True
 
         DEBUG("authClient: attempting to initialize")
 
+        # Ends when the helper first asks for a password
+        timing.start("auth_startup")
+
         self.cancellable = Gio.Cancellable()
 
         try:
@@ -62,6 +67,7 @@ class AuthClient(GObject.Object):
 
         except GLib.Error as e:
             print("authClient: error starting cinnamon-screensaver-pam-helper: %s" % e.message)
+            timing.cancel("auth_startup")
             return False
 
         self.proc.wait_check_async(self.cancellable, self.on_proc_completed, None)
@@ -140,6 +146,9 @@ class AuthClient(GObject.Object):
 
         DEBUG("authClient: message to child")
 
+        # Ends when the helper reports success or failure
+        timing.start("auth_check")
+
         try:
             b = GLib.Bytes.new(string.encode())
 
@@ -175,8 +184,10 @@ class AuthClient(GObject.Object):
                 DEBUG("Output from pam helper: '%s'" % output)
                 if output:
                     if "CS_PAM_AUTH_FAILURE" in output:
+                        timing.end("auth_check")
                         self.emit_idle_failure()
                     if "CS_PAM_AUTH_SUCCESS" in output:
+                        timing.end("auth_check")
                         self.emit_idle_success()
                         terminate = True
                     if "CS_PAM_AUTH_CANCELLED" in output:
@@ -187,6 +198,7 @@ class AuthClient(GObject.Object):
                     if "CS_PAM_AUTH_BUSY_FALSE" in output:
                         self.emit_idle_busy_state(False)
                     if "CS_PAM_AUTH_SET_PROMPT" in output:
+                        timing.end("auth_startup")
                         prompt = re.search('(?<=CS_PAM_AUTH_SET_PROMPT_)(.*)(?=_)', output).group(0)
                         self.emit_idle_auth_prompt(prompt)
                     if "CS_PAM_AUTH_SET_INFO" in output:
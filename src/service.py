@@ -6,8 +6,8 @@ gi.require_version('CScreensaver', '1.0')
 from gi.repository import Gtk, CScreensaver, Gio, GObject
 
 import constants as c
-from manager import ScreensaverManager
 import status
+from util import timing
 from util.utils import DEBUG
 
 class ScreensaverService(GObject.Object):
@@ -34,9 +34,9 @@ class ScreensaverService(GObject.Object):
         self.interface.connect("handle-get-active", self.handle_get_active)
         self.interface.connect("handle-get-active-time", self.handle_get_active_time)
         self.interface.connect("handle-simulate-user-activity", self.handle_simulate_user_activity)
+        self.interface.connect("handle-set-tracing", self.handle_set_tracing)
 
-        self.manager = ScreensaverManager()
-        self.manager.connect("active-changed", self.on_active_changed)
+        self.manager = None
 
         """
         The stage constructs itself and fades in asynchronously, and most importantly,
@@ -59,6 +59,18 @@ class ScreensaverService(GObject.Object):
 
         self.interface.export(self.bus, c.SS_PATH)
 
+    def start(self):
+        """
+        Creates the ScreensaverManager, which brings in most of the rest of the program.
+        This is called from the application's startup handler - our interface is already
+        exported and our name owned by then, and since no method calls are dispatched
+        until the main loop runs, none can arrive before the manager exists.
+        """
+        from manager import ScreensaverManager
+
+        self.manager = ScreensaverManager()
+        self.manager.connect("active-changed", self.on_active_changed)
+
     def poke_process(self, method_name):
         if not status.Awake:
             DEBUG("service: '%s' received, poking application." % method_name)
@@ -83,8 +95,11 @@ class ScreensaverService(GObject.Object):
 
         self.poke_process("Lock")
 
+        timing.start("lock")
+
         if self.manager.lock(msg):
             iface.complete_lock(inv)
+            timing.end("lock")
         else:
             self.lock_queue.append(inv)
 
@@ -103,9 +118,12 @@ class ScreensaverService(GObject.Object):
         self.poke_process("SetActive")
 
         if active:
-            self.manager.set_active(active)
+            timing.start("set_active")
+            if self.manager.set_active(active) and status.Active:
+                timing.end("set_active")
         else:
-            self.manager.unlock()
+            with timing.phase("unlock"):
+                self.manager.unlock()
 
         iface.complete_set_active(inv)
 
@@ -143,7 +161,22 @@ class ScreensaverService(GObject.Object):
 
         return True
 
+    def handle_set_tracing(self, iface, inv, enabled, filename):
+        """
+        Starts or stops recording trace events (see util/timing.py).  When stopped,
+        the trace is written to filename, or if it's empty, the file given to --trace,
+        or a default location in the user's runtime dir.
+        """
+        self.poke_process("SetTracing")
+
+        timing.set_tracing(enabled, filename)
+
+        iface.complete_set_tracing(inv)
+
+        return True
+
     def on_active_changed(self, manager, state, data=None):
+        timing.start("active_changed")
         GObject.idle_add(self.on_active_changed_idle, state)
 
     def on_active_changed_idle(self, state):
@@ -156,3 +189,9 @@ class ScreensaverService(GObject.Object):
         self.lock_queue = []
 
         self.interface.emit_active_changed(state)
+
+        timing.end("active_changed")
+
+        if state:
+            timing.end("lock")
+            timing.end("set_active")
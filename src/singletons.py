@@ -2,8 +2,9 @@
 
 import gi
 
-from util import trackers, settings
+from util import trackers, settings, timing
 from util.utils import DEBUG
+import constants as c
 import status
 
 # Watch for, and kill, mate- and gnome-screensaver in case they're activated by a program
@@ -13,11 +14,16 @@ NameBlocker = _NameBlocker()
 
 # Our dbus proxies are abstracted out one level more than really necessary - we have
 # clients that the screensaver initializes, that can never fail.  The actual connection
-# business to the various dbus address is performed asynchronously from within each client.
+# business to the various dbus address is performed asynchronously from within each client,
+# so they all connect at the same time, and none of them hold up startup.
 # The following clients can fail to establish with their respective dbus interfaces without
 # completely breaking the program (or at least that's what we're after) - it just means that
 # depending on what fails, you may end up without keyboard shortcut support, or a battery
 # widget, etc...
+#
+# The registry keeps track of which clients are ready yet - anything that needs a particular
+# client to have finished connecting uses Clients.call_when_ready().
+from dbusdepot.clientRegistry import ClientRegistry, ClientStartup
 from dbusdepot.cinnamonClient import CinnamonClient as _CinnamonClient
 from dbusdepot.sessionClient import SessionClient as _SessionClient
 from dbusdepot.uPowerClient import UPowerClient as _UPowerClient
@@ -26,12 +32,17 @@ from dbusdepot.mediaPlayerWatcher import MediaPlayerWatcher as _MediaPlayerWatch
 from dbusdepot.accountsServiceClient import AccountsServiceClient as _AccountsServiceClient
 from dbusdepot.muffinClient import MuffinClient as _MuffinClient
 
-CinnamonClient = _CinnamonClient()
-SessionClient = _SessionClient()
-UPowerClient = _UPowerClient()
-KeybindingHandlerClient = _KeybindingHandlerClient()
-MediaPlayerWatcher = _MediaPlayerWatcher()
-AccountsServiceClient = _AccountsServiceClient()
+Clients = ClientRegistry()
+
+CinnamonClient = Clients.add("cinnamon", _CinnamonClient)
+SessionClient = Clients.add("session", _SessionClient)
+UPowerClient = Clients.add("upower", _UPowerClient)
+KeybindingHandlerClient = Clients.add("keybinding-handler", _KeybindingHandlerClient)
+MediaPlayerWatcher = Clients.add("media-player-watcher", _MediaPlayerWatcher)
+AccountsServiceClient = Clients.add("accounts", _AccountsServiceClient)
+
+# We need to know the fractional scaling state before starting the event filter.
+MuffinClient = Clients.add("muffin", _MuffinClient)
 
 # The notification watcher is a C introspected class - some of the functions it uses
 # don't work well via introspection.
@@ -40,17 +51,58 @@ from gi.repository import CScreensaver
 NotificationWatcher = CScreensaver.NotificationWatcher.new(status.Debug)
 
 # We only need one instance of CinnamonDesktop.BG - have it listen to bg gsettings changes
-# and we just connect to "changed" on the Backgrounds object from our user (the Stage)
-gi.require_version('CinnamonDesktop', '3.0')
-from gi.repository import CinnamonDesktop
+# and we just connect to "changed" on the Backgrounds object from our user (the Stage).
+#
+# Rendered wallpapers are kept around (in the WallpaperCache), so they don't need to be
+# rendered again at every activation.  The cache clears itself when the background
+# settings change.
+#
+# Neither is needed until there's a Stage to show, so they (and the CinnamonDesktop typelib)
+# are only loaded by setup_backgrounds(), after startup - see ScreensaverManager.prefetch_stage().
+Backgrounds = None
+WallpaperCache = None
+
+def setup_backgrounds():
+    global Backgrounds, WallpaperCache
+
+    if Backgrounds is not None:
+        return
+
+    gi.require_version('CinnamonDesktop', '3.0')
+    from gi.repository import CinnamonDesktop
+
+    Backgrounds = CinnamonDesktop.BG()
+    Backgrounds.load_from_preferences(settings.bg_settings)
+
+    settings.bg_settings.connect("changed", _on_bg_settings_changed)
+
+    from wallpaperCache import WallpaperCache as _WallpaperCache
+    WallpaperCache = _WallpaperCache(Backgrounds)
 
-Backgrounds = CinnamonDesktop.BG()
-Backgrounds.load_from_preferences(settings.bg_settings)
-settings.bg_settings.connect("changed", lambda s,k: Backgrounds.load_from_preferences(s))
+# Changing the wallpaper usually changes several keys at once (the picture, its options,
+# the colors...) - wait for things to be quiet for a moment, and reload them all together.
+_bg_reload_queued = False
 
-# This sets up synchronously, as we need to know the fractional scaling state before
-# setting up the screensaver.
-MuffinClient = _MuffinClient()
+def _on_bg_settings_changed(settings, key):
+    global _bg_reload_queued
+
+    if _bg_reload_queued:
+        timing.count("bg_reload_suppressed")
+
+    _bg_reload_queued = True
+
+    trackers.timer_tracker_get().start("reload-backgrounds",
+                                       c.BG_RELOAD_DELAY,
+                                       _reload_backgrounds)
+
+def _reload_backgrounds():
+    global _bg_reload_queued
+    _bg_reload_queued = False
+
+    timing.count("bg_reload")
+    Backgrounds.load_from_preferences(settings.bg_settings)
+
+    return False
 
 # The login client is a bit different - we can have either logind or ConsoleKit.
 # So, we have to do a bit more work to determine which one we're going to use.
@@ -61,58 +113,73 @@ MuffinClient = _MuffinClient()
 from dbusdepot.consoleKitClient import ConsoleKitClient
 from dbusdepot.logindClient import LogindClient
 
-class LoginClientResolver:
-    def __init__(self, manager):
-
-        self.manager = manager
+class LoginClientResolver(ClientStartup):
+    """
+    Tries logind and ConsoleKit at the same time.  logind is preferred, so we only
+    settle on ConsoleKit once logind has failed.
+    """
+    def __init__(self):
+        self.manager = None
         self.login_client = None
 
-        self.try_logind()
+        self.logind_result = None
+        self.consolekit_result = None
 
-    def try_logind(self):
-        print("Trying to connect to logind...", flush=True)
+        print("Trying to connect to logind and ConsoleKit...", flush=True)
 
-        login_client = LogindClient()
-        trackers.con_tracker_get().connect(login_client,
+        self.logind_client = LogindClient()
+        trackers.con_tracker_get().connect(self.logind_client,
                                            "startup-status",
                                            self.on_logind_startup_result)
 
+        self.consolekit_client = ConsoleKitClient()
+        trackers.con_tracker_get().connect(self.consolekit_client,
+                                           "startup-status",
+                                           self.on_consolekit_startup_result)
+
+    def set_manager(self, manager):
+        self.manager = manager
+
     def on_logind_startup_result(self, client, success):
         trackers.con_tracker_get().disconnect(client,
                                               "startup-status",
                                               self.on_logind_startup_result)
 
+        self.logind_result = success
+
         if success:
             print("Successfully using logind", flush=True)
             self.login_client = client
             self.setup_manager_connections()
+            self.startup_finished(True)
         else:
             print("Failed to connect to logind, or it doesn't exist.", flush=True)
-            self.try_console_kit()
-
-    def try_console_kit(self):
-        print("Trying to connect to ConsoleKit...", flush=True)
-
-        login_client = ConsoleKitClient()
-        trackers.con_tracker_get().connect(login_client,
-                                           "startup-status",
-                                           self.on_consolekit_startup_result)
+            self.check_console_kit()
 
     def on_consolekit_startup_result(self, client, success):
         trackers.con_tracker_get().disconnect(client,
                                               "startup-status",
                                               self.on_consolekit_startup_result)
 
-        if success:
+        self.consolekit_result = success
+        self.check_console_kit()
+
+    def check_console_kit(self):
+        if self.logind_result is not False or self.consolekit_result is None:
+            return
+
+        if self.consolekit_result:
             print("Successfully using ConsoleKit", flush=True)
-            self.login_client = client
+            self.login_client = self.consolekit_client
             self.setup_manager_connections()
+            self.startup_finished(True)
         else:
             print("Failed to connect to ConsoleKit, or it doesn't exist.\n", flush=True)
 
             print("Unable to connect to either logind or ConsoleKit.  Certain things will not work,", flush=True)
             print("such as automatic unlocking when switching users from the desktop manager,", flush=True)
             print("or locking in appropriate power/system-management events.", flush=True)
+            self.startup_finished(False)
 
     def setup_manager_connections(self):
         trackers.con_tracker_get().connect(self.login_client,
@@ -138,4 +205,6 @@ class LoginClientResolver:
     def on_session_manager_active(self, client):
         DEBUG("Received Active changed from session manager")
 
-        self.manager.refresh_stage()
+        self.manager.queue_refresh_stage(cause="session-active")
+
+LoginClient = Clients.add("login", LoginClientResolver)
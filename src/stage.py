@@ -4,20 +4,21 @@ import gi
 gi.require_version('CDesktopEnums', '3.0')
 
 from gi.repository import GLib, Gtk, Gdk, CScreensaver, CDesktopEnums, GObject
-import random
 
 import status
 import constants as c
 import singletons
-from floating import Floating
+from floating import Floating, FloaterSlots
+from stageLayout import StageLayout
 from monitorView import MonitorView
 from unlock import UnlockDialog
 from clock import ClockWidget
 from albumArt import AlbumArt
 from audioPanel import AudioPanel
 from infoPanel import InfoPanel
-from util import utils, trackers, settings
+from util import utils, trackers, settings, timing, memory
 from util.eventHandler import EventHandler
+from util.pointerMonitor import PointerMonitor
 from util.utils import DEBUG
 
 try:
@@ -28,6 +29,35 @@ except Exception as e:
 
 FLOATER_POSITIONING_TIMEOUT = 30
 
+# Everything our widgets read settings from when they're constructed - see on_stage_settings_changed().
+STAGE_SETTINGS = (settings.ss_settings,
+                  settings.if_settings,
+                  settings.osk_settings,
+                  settings.a11y_settings)
+
+def is_spanned():
+    return settings.bg_settings.get_enum("picture-options") == CDesktopEnums.BackgroundStyle.SPANNED
+
+def get_layout_key():
+    """
+    Returns a summary of the current screen and monitor layout, along with anything else
+    that determines how the MonitorViews are built.  A retained Stage can only be re-used
+    if this hasn't changed.
+    """
+    spanned = is_spanned()
+
+    rect = status.screen.get_screen_geometry()
+    monitors = ()
+
+    for i in range(status.screen.get_n_monitors()):
+        m = status.screen.get_monitor_geometry(i)
+        monitors += ((m.x, m.y, m.width, m.height),)
+
+    return (spanned,
+            status.screen.get_global_scale(),
+            (rect.x, rect.y, rect.width, rect.height),
+            monitors)
+
 class Stage(Gtk.Window):
     """
     The Stage is the toplevel window of the entire screensaver while
@@ -43,7 +73,7 @@ class Stage(Gtk.Window):
     ScreensaverManager.
     """
     __gsignals__ = {
-        'needs-refresh': (GObject.SignalFlags.RUN_LAST, None, ()),
+        'needs-refresh': (GObject.SignalFlags.RUN_LAST, None, (str,)),
     }
 
     def __init__(self, manager, away_message):
@@ -64,14 +94,29 @@ class Stage(Gtk.Window):
                                            "changed",
                                            self.on_bg_changed)
 
+        for stage_settings in STAGE_SETTINGS:
+            trackers.con_tracker_get().connect(stage_settings,
+                                               "changed",
+                                               self.on_stage_settings_changed)
+
         self.destroying = False
 
+        # Set while we're hidden and waiting to be re-used by the next activation.
+        # See retain() and restore().
+        self.retained = False
+        self.stale = False
+        self.wallpaper_dirty = False
+        self.layout_key = None
+        self.focus_widgets = []
+        self.delayed_components_done = False
+
         self.manager = manager
         self.away_message = away_message
 
         self.activate_callback = None
 
         self.monitors = []
+        self.pointer_monitor = PointerMonitor()
         self.last_focus_monitor = -1
         self.overlay = None
         self.clock_widget = None
@@ -82,9 +127,11 @@ class Stage(Gtk.Window):
         self.osk = None
 
         self.floaters = []
-        self.floaters_need_update = False
+        self.floater_slots = FloaterSlots()
+        self.floater_damage = {}
+        self.floater_damage_pixels = 0
 
-        self.event_handler = EventHandler(manager)
+        self.event_handler = EventHandler(manager, self)
 
         self.get_style_context().remove_class("background")
 
@@ -105,16 +152,13 @@ class Stage(Gtk.Window):
 
         self.update_geometry()
 
-        self.overlay = Gtk.Overlay()
+        self.overlay = StageLayout(self.pointer_monitor)
+        self.setup_layout_rules()
 
         trackers.con_tracker_get().connect(self.overlay,
                                            "realize",
                                            self.on_realized)
 
-        trackers.con_tracker_get().connect(self.overlay,
-                                           "get-child-position",
-                                           self.position_overlay_child)
-
         self.overlay.show_all()
         self.add(self.overlay)
 
@@ -130,7 +174,23 @@ class Stage(Gtk.Window):
         # our window group in muffin, from showing up over the Stage.
         # For instance: Chrome and Firefox native notifications.
         self.gdk_filter = CScreensaver.GdkEventFilter.new(self, 0)
+        self.gdk_filter_wait_id = 0
+        self.gdk_filter_running = False
+
+        trackers.con_tracker_get().connect(singletons.MuffinClient,
+                                           "muffin-config-changed",
+                                           self.on_muffin_config_changed)
+
+        self.connect_screen_signals()
+
+        trackers.con_tracker_get().connect(self,
+                                           "grab-broken-event",
+                                           self.on_grab_broken_event)
 
+        if status.InteractiveDebug:
+            self.set_interactive_debugging(True)
+
+    def connect_screen_signals(self):
         trackers.con_tracker_get().connect(status.screen,
                                            "size-changed",
                                            self.on_screen_size_changed)
@@ -143,22 +203,107 @@ class Stage(Gtk.Window):
                                            "composited-changed",
                                            self.on_composited_changed)
 
-        trackers.con_tracker_get().connect(self,
-                                           "grab-broken-event",
-                                           self.on_grab_broken_event)
+    def disconnect_screen_signals(self):
+        trackers.con_tracker_get().disconnect(status.screen,
+                                              "size-changed",
+                                              self.on_screen_size_changed)
 
-        if status.InteractiveDebug:
-            self.set_interactive_debugging(True)
+        trackers.con_tracker_get().disconnect(status.screen,
+                                              "monitors-changed",
+                                              self.on_monitors_changed)
 
-    def update_monitors(self):
-        self.destroy_monitor_views()
+        trackers.con_tracker_get().disconnect(status.screen,
+                                              "composited-changed",
+                                              self.on_composited_changed)
+
+    @timing.traced
+    def refresh(self):
+        """
+        Brings the Stage up to date with the current screen and monitor layout, without
+        rebuilding it.  Only the MonitorViews that need it are added, removed or resized -
+        everything else (the unlock dialog and any authentication in progress, the clock,
+        the panels) is kept, and simply re-positioned.
+
+        Returns False if this isn't possible, and the Stage needs to be rebuilt instead.
+        """
+        if self.retained or self.unlock_dialog is None or not self.get_realized():
+            return False
 
         try:
-            self.setup_monitors()
-            for monitor in self.monitors:
-                self.sink_child_widget(monitor)
+            self.update_geometry()
+            self.move_onscreen()
+
+            self.update_monitors()
+            self.update_child_monitors()
         except Exception as e:
-            print("Problem updating monitor views views: %s" % str(e))
+            print("Problem refreshing the stage, rebuilding it: %s" % str(e))
+            return False
+
+        self.layout_key = get_layout_key()
+        self.floater_slots.update_layout()
+        self.pointer_monitor.update_layout()
+        self.overlay.set_layout_key(self.layout_key)
+
+        # Spread the floaters over the new layout.
+        if settings.get_allow_floating() and not status.Awake:
+            self.move_floaters()
+
+        self.overlay.queue_resize()
+
+        return True
+
+    def update_monitors(self):
+        """
+        Adds, removes or resizes MonitorViews to match the current monitor layout.
+        Views whose monitor is the same size only need to be re-allocated.
+        """
+        wanted = self.get_monitor_indices()
+
+        views = {}
+
+        for monitor in self.monitors:
+            if monitor.monitor_index in wanted and monitor.monitor_index not in views:
+                views[monitor.monitor_index] = monitor
+            else:
+                DEBUG("Stage: removing monitor view %d" % monitor.monitor_index)
+                monitor.destroy()
+
+        self.monitors = []
+
+        for index in wanted:
+            monitor = views.get(index)
+
+            if monitor is None:
+                DEBUG("Stage: adding monitor view %d" % index)
+                monitor = self.create_monitor_view(index)
+                self.sink_child_widget(monitor)
+            else:
+                monitor.update_geometry()
+
+                if monitor.get_wallpaper_layout() != monitor.wallpaper_layout:
+                    DEBUG("Stage: resizing monitor view %d" % index)
+                    self.set_monitor_wallpaper(monitor)
+
+            self.monitors.append(monitor)
+
+        self.update_monitor_views()
+
+    def update_child_monitors(self):
+        """
+        Moves our other children back onto a valid monitor, if theirs has gone away.
+        """
+        n_monitors = status.screen.get_n_monitors()
+        primary = status.screen.get_primary_monitor()
+
+        for panel in (self.audio_panel, self.info_panel):
+            if panel is not None:
+                panel.monitor_index = primary
+                panel.update_geometry()
+
+        for floater in self.floaters:
+            if floater.current_monitor >= n_monitors:
+                floater.set_next_position(primary, floater.get_halign(), floater.get_valign())
+                floater.apply_next_position()
 
     def on_screen_size_changed(self, screen, data=None):
         """
@@ -168,7 +313,7 @@ class Stage(Gtk.Window):
 
         DEBUG("Stage: Received screen size-changed signal, refreshing stage")
 
-        self.emit("needs-refresh")
+        self.emit("needs-refresh", "size-changed")
 
     def on_monitors_changed(self, screen, data=None):
         """
@@ -178,13 +323,13 @@ class Stage(Gtk.Window):
         """
         DEBUG("Stage: Received screen monitors-changed signal, refreshing stage")
 
-        self.emit("needs-refresh")
+        self.emit("needs-refresh", "monitors-changed")
 
     def on_composited_changed(self, screen, data=None):
         if self.get_realized():
             DEBUG("Stage: Received screen composited-changed signal, refreshing stage")
 
-            self.emit("needs-refresh")
+            self.emit("needs-refresh", "composited-changed")
 
     def on_grab_broken_event(self, widget, event, data=None):
         GObject.idle_add(self.manager.grab_stage)
@@ -198,6 +343,10 @@ class Stage(Gtk.Window):
 
         self.set_opacity(1.0)
         self.move_onscreen()
+
+        if not self.get_realized():
+            timing.start("realize")
+
         self.show()
 
         if self.get_realized():
@@ -212,6 +361,152 @@ class Stage(Gtk.Window):
         self.hide()
         callback()
 
+    def retain(self):
+        """
+        Called by the ScreensaverManager (instead of destroy_stage()) when status.RetainStage
+        is set.  The Stage is already hidden at this point - stop anything that only makes sense
+        while we're active, and put our children back into their initial state, so the next
+        activation only needs to show us again.
+
+        We stop listening to status.screen here, and check it's still the same layout in
+        restore().
+        """
+        self.retained = True
+
+        self.stop_float_timer()
+        self.set_timeout_active(None, False)
+        trackers.timer_tracker_get().cancel("setup-delayed-components")
+
+        self.stop_gdk_filter()
+        self.disconnect_screen_signals()
+
+        # The manager clears this when deactivating, we'll put it back in restore().
+        self.focus_widgets = status.focusWidgets
+
+        if self.unlock_dialog is not None:
+            self.unlock_dialog.reset()
+
+        if self.osk is not None:
+            self.osk.reset()
+
+        self.event_handler.reset()
+        self.pointer_monitor.reset()
+        self.last_focus_monitor = -1
+
+    def can_restore(self):
+        """
+        Whether this retained Stage can still be used with the current monitor layout
+        and settings.  If not, the manager will destroy it and build a new one.
+        """
+        if self.stale:
+            DEBUG("Stage: screensaver settings changed since the stage was built")
+            return False
+
+        if self.layout_key != get_layout_key():
+            DEBUG("Stage: monitor layout or wallpaper style changed since the stage was retained")
+            return False
+
+        return True
+
+    def restore(self, away_message):
+        """
+        Prepares a retained Stage to be activated again.  This is followed by activate(),
+        same as a newly constructed Stage.
+        """
+        self.retained = False
+        self.away_message = away_message
+
+        self.connect_screen_signals()
+        self.update_geometry()
+
+        status.focusWidgets = self.focus_widgets
+
+        # The notification watcher kept counting while the desktop was unlocked - only
+        # notifications missed while we're locked should show.
+        if self.info_panel is not None:
+            self.info_panel.reset_notifications()
+
+        if self.wallpaper_dirty:
+            self.wallpaper_dirty = False
+            self.on_bg_changed(singletons.Backgrounds)
+
+        if self.audio_panel is not None and self.audio_panel.volume_widget.controller is None:
+            self.audio_panel.volume_widget.initialize_sound_controller()
+
+        # The clock and album art are hidden after a successful unlock.
+        if self.clock_widget is not None and settings.get_show_clock():
+            self.clock_widget.start_positioning()
+        if self.albumart_widget is not None and settings.get_show_albumart():
+            self.albumart_widget.start_positioning()
+
+        self.start_gdk_filter()
+
+        if self.delayed_components_done:
+            self.start_float_timer()
+        else:
+            trackers.timer_tracker_get().start("setup-delayed-components",
+                                               2000,
+                                               self.setup_delayed_components)
+
+    def trim_memory(self):
+        """
+        Called while we're retained, in resident mode, to give back what we can until we're
+        needed again.  Our wallpaper images are dropped (and rendered again in restore()),
+        and the volume control closes its mixer connection.
+        """
+        for monitor in self.monitors:
+            monitor.clear_wallpaper()
+
+        self.wallpaper_dirty = True
+
+        if self.audio_panel is not None:
+            self.audio_panel.volume_widget.release_sound_controller()
+
+    def start_gdk_filter(self):
+        """
+        The event filter needs to know whether fractional scaling is in use.  Muffin will
+        have long since told us, unless we're activating right after startup - if so, wait
+        for it (but not for long).
+        """
+        self.gdk_filter_wait_id = singletons.Clients.call_when_ready(["muffin"], self.on_muffin_client_ready)
+
+    def on_muffin_client_ready(self):
+        self.gdk_filter_wait_id = 0
+        self.gdk_filter.start(singletons.MuffinClient.get_using_fractional_scaling(), status.Debug)
+        self.gdk_filter_running = True
+
+    def stop_gdk_filter(self):
+        if self.gdk_filter_wait_id > 0:
+            singletons.Clients.cancel(self.gdk_filter_wait_id)
+            self.gdk_filter_wait_id = 0
+
+        self.gdk_filter.stop()
+        self.gdk_filter_running = False
+
+    def on_muffin_config_changed(self, client):
+        """
+        The fractional scaling state we started the event filter with was out of date (from
+        the startup snapshot, or the monitors have changed since) - restart it.
+        """
+        if self.gdk_filter_running:
+            DEBUG("Stage: fractional scaling changed, restarting the event filter")
+            self.stop_gdk_filter()
+            self.start_gdk_filter()
+
+    def on_stage_settings_changed(self, changed_settings, key, data=None):
+        """
+        Most of our widgets read their settings only once, when they're constructed.  If
+        anything changes (even while we're showing), we'll need to be rebuilt before we
+        can be retained and used again.  The keyboard layout is the exception - we save
+        that ourselves.
+        """
+        if changed_settings == settings.ss_settings and key == settings.KB_LAYOUT_KEY:
+            return
+
+        DEBUG("Stage: setting '%s' changed, can't be restored" % key)
+        self.stale = True
+
+    @timing.traced
     def on_realized(self, widget):
         """
         Repositions the window when it is realized, to cover the entire
@@ -220,14 +515,17 @@ class Stage(Gtk.Window):
         From here we also proceed to construct all overlay children and
         activate our window suppressor.
         """
+        timing.end("realize")
+
         window = self.get_window()
         utils.override_user_time(window)
 
         CScreensaver.Screen.set_net_wm_name(window, "cinnamon-screensaver-window")
 
-        self.setup_children()
+        with timing.phase("setup_children"):
+            self.setup_children()
 
-        self.gdk_filter.start(singletons.MuffinClient.get_using_fractional_scaling(), status.Debug)
+        self.start_gdk_filter()
 
         trackers.con_tracker_get().disconnect(self.overlay,
                                               "realize",
@@ -251,6 +549,7 @@ class Stage(Gtk.Window):
     def deactivate_after_timeout(self):
         self.manager.set_active(False)
 
+    @timing.traced
     def setup_children(self):
         """
         Creates all of our overlay children.  If a new 'widget' gets added,
@@ -274,6 +573,11 @@ class Stage(Gtk.Window):
             total_failure = True
 
         if not total_failure:
+            self.layout_key = get_layout_key()
+            self.floater_slots.update_layout()
+            self.pointer_monitor.update_layout()
+            self.overlay.set_layout_key(self.layout_key)
+
             try:
                 self.setup_clock()
             except Exception as e:
@@ -296,6 +600,7 @@ class Stage(Gtk.Window):
             print("Total failure somewhere, deactivating screensaver.")
             GObject.idle_add(self.deactivate_after_timeout)
 
+    @timing.traced
     def setup_delayed_components(self, data=None):
         try:
             self.setup_albumart()
@@ -309,6 +614,7 @@ class Stage(Gtk.Window):
             self.audio_panel = None
             self.info_panel = None
 
+        self.delayed_components_done = True
         self.start_float_timer()
 
     def start_float_timer(self):
@@ -320,13 +626,63 @@ class Stage(Gtk.Window):
             trackers.timer_tracker_get().start_seconds("floater-update", timeout, self.update_floaters)
 
     def update_floaters(self):
-        self.floaters_need_update = True
-        self.overlay.queue_allocate()
+        """
+        Moves the floating widgets somewhere new.  Only they are re-allocated (re-allocating the
+        overlay would redraw everything) - so only the areas they're leaving and moving to are
+        redrawn, and the monitors are left alone.
+        """
+        self.floater_damage = {}
+        self.floater_damage_pixels = 0
+
+        for floater in self.floaters:
+            if floater.get_visible():
+                self.floater_damage[floater] = floater.get_allocation()
+
+        self.move_floaters()
+
+        for floater in self.floater_damage:
+            floater.queue_resize()
+
         return GLib.SOURCE_CONTINUE
 
+    def move_floaters(self):
+        """
+        Gives each floating widget a new slot (see FloaterSlots), and moves it there.
+        """
+        self.floater_slots.rotate(self.floaters)
+
+        for floater in self.floaters:
+            floater.apply_next_position()
+
     def stop_float_timer(self):
         trackers.timer_tracker_get().cancel("floater-update")
-        self.floaters_need_update = False
+        self.floater_damage = {}
+
+    def add_floater_damage(self, floater, allocation):
+        """
+        Counts the pixels redrawn for a floater that's just been moved by update_floaters() -
+        the area it left, and the area it moved to.  Once they've all moved, the total is
+        reported (see timing.gauge())
+        """
+        old = self.floater_damage.pop(floater, None)
+
+        if old is None:
+            return
+
+        pixels = (old.width * old.height) + (allocation.width * allocation.height)
+
+        overlaps, overlap = old.intersect(allocation)
+
+        if overlaps:
+            pixels -= overlap.width * overlap.height
+
+        scale = self.get_scale_factor()
+
+        self.floater_damage_pixels += int(pixels) * scale * scale
+
+        if not self.floater_damage:
+            timing.gauge("floater_repaint_pixels", self.floater_damage_pixels)
+            DEBUG("Stage: moving the floating widgets repainted %d pixels" % self.floater_damage_pixels)
 
     def destroy_children(self):
         self.stop_float_timer()
@@ -413,6 +769,11 @@ class Stage(Gtk.Window):
                                               "changed",
                                               self.on_bg_changed)
 
+        for stage_settings in STAGE_SETTINGS:
+            trackers.con_tracker_get().disconnect(stage_settings,
+                                                  "changed",
+                                                  self.on_stage_settings_changed)
+
         trackers.con_tracker_get().disconnect(self.power_client,
                                               "power-state-changed",
                                               self.on_power_state_changed)
@@ -424,71 +785,132 @@ class Stage(Gtk.Window):
         self.set_timeout_active(None, False)
 
         trackers.timer_tracker_get().cancel("setup-delayed-components")
+        trackers.timer_tracker_get().cancel("report-wallpaper-memory")
         self.destroy_children()
 
-        self.gdk_filter.stop()
-        self.gdk_filter = None
-
-        trackers.con_tracker_get().disconnect(status.screen,
-                                              "size-changed",
-                                              self.on_screen_size_changed)
+        trackers.con_tracker_get().disconnect(singletons.MuffinClient,
+                                              "muffin-config-changed",
+                                              self.on_muffin_config_changed)
 
-        trackers.con_tracker_get().disconnect(status.screen,
-                                              "monitors-changed",
-                                              self.on_monitors_changed)
+        self.stop_gdk_filter()
+        self.gdk_filter = None
 
-        trackers.con_tracker_get().disconnect(self.overlay,
-                                              "get-child-position",
-                                              self.position_overlay_child)
+        self.disconnect_screen_signals()
 
         self.destroy()
 
+    @timing.traced
     def setup_monitors(self):
         """
         Iterate through the monitors, and create MonitorViews for each one
         to cover them.
         """
         self.monitors = []
-        status.Spanned = settings.bg_settings.get_enum("picture-options") == CDesktopEnums.BackgroundStyle.SPANNED
 
-        if status.InteractiveDebug or status.Spanned:
-            monitors = (status.screen.get_primary_monitor(),)
-        else:
-            n = status.screen.get_n_monitors()
-            monitors = ()
-            for i in range(n):
-                monitors += (i,)
+        for index in self.get_monitor_indices():
+            self.monitors.append(self.create_monitor_view(index))
 
-        for index in monitors:
-            monitor = MonitorView(index)
+        self.update_monitor_views()
 
-            image = Gtk.Image()
+    def get_monitor_indices(self):
+        """
+        Returns the monitors that need a MonitorView - only the primary one in interactive debug mode.
+        """
+        status.Spanned = is_spanned()
 
-            singletons.Backgrounds.create_and_set_gtk_image (image,
-                                                             monitor.rect.width,
-                                                             monitor.rect.height)
+        if status.InteractiveDebug:
+            return (status.screen.get_primary_monitor(),)
 
-            monitor.set_next_wallpaper_image(image)
+        return tuple(range(status.screen.get_n_monitors()))
 
-            self.monitors.append(monitor)
+    def create_monitor_view(self, index):
+        monitor = MonitorView(index)
 
-            self.add_child_widget(monitor)
+        self.set_monitor_wallpaper(monitor)
+        self.add_child_widget(monitor)
 
-        self.update_monitor_views()
+        return monitor
+
+    def set_monitor_wallpaper(self, monitor):
+        """
+        Requests a wallpaper for the monitor.  Unless it's been rendered before, this happens in
+        the background - until then, the monitor is covered in the background color, so we can
+        cover the screen without waiting.
+
+        Monitors of the same size share a single wallpaper surface.  If the background is spanned,
+        each monitor only gets the part of it (a tile) that it shows - the rest is never kept.
+        """
+        monitor.wallpaper_serial += 1
+        monitor.wallpaper_layout = monitor.get_wallpaper_layout()
+
+        rect = monitor.get_wallpaper_rect()
+
+        if not singletons.WallpaperCache.request(rect.width,
+                                                 rect.height,
+                                                 monitor.get_wallpaper_scale(),
+                                                 self.on_wallpaper_ready,
+                                                 monitor,
+                                                 monitor.wallpaper_serial,
+                                                 tile=monitor.get_wallpaper_tile()):
+            monitor.show_placeholder()
+
+    def on_wallpaper_ready(self, surface, monitor, serial):
+        if serial != monitor.wallpaper_serial:
+            return
+
+        monitor.set_wallpaper(surface, serial)
+
+        # Wait until any other monitors being set up right now have been requested too.
+        trackers.timer_tracker_get().start("report-wallpaper-memory",
+                                           0,
+                                           self.report_wallpaper_memory)
+
+    def report_wallpaper_memory(self):
+        """
+        Once every monitor is showing its wallpaper, reports how much memory their surfaces
+        use, and how much they'd use if each monitor had its own.
+        """
+        if not all(monitor.has_current_wallpaper() for monitor in self.monitors):
+            return False
+
+        surfaces = {}
+        unshared = 0
+
+        for monitor in self.monitors:
+            scale = monitor.get_wallpaper_scale()
+
+            surfaces[id(monitor.wallpaper_surface)] = monitor.wallpaper_size
+            unshared += monitor.rect.width * monitor.rect.height * scale * scale * 4
+
+        shared = sum(surfaces.values())
+
+        timing.gauge("wallpaper_memory_shared", shared)
+        timing.gauge("wallpaper_memory_unshared", unshared)
+
+        DEBUG("Stage: %d monitors are using %d wallpaper surfaces: %s (%s without sharing)" % (len(self.monitors),
+                                                                                                len(surfaces),
+                                                                                                memory.format_size(shared),
+                                                                                                memory.format_size(unshared)))
+
+        return False
 
     def on_bg_changed(self, bg):
         """
         Callback for our GnomeBackground instance, this tells us when
         the background settings have changed, so we can update our wallpaper.
+
+        If we're retained, there's no point rendering anything until we're shown again.
         """
-        for monitor in self.monitors:
-            image = Gtk.Image()
+        if self.retained:
+            self.wallpaper_dirty = True
+            return
+
+        timing.count("bg_rerender")
 
-            singletons.Backgrounds.create_and_set_gtk_image (image,
-                                                             monitor.rect.width,
-                                                             monitor.rect.height)
+        status.Spanned = is_spanned()
 
-            monitor.set_next_wallpaper_image(image)
+        for monitor in self.monitors:
+            self.set_monitor_wallpaper(monitor)
 
     def on_power_state_changed(self, client, data=None):
         """
@@ -500,6 +922,7 @@ class Stage(Gtk.Window):
         if self.info_panel is not None:
             self.info_panel.update_visibility()
 
+    @timing.traced
     def setup_clock(self):
         """
         Construct the clock widget and add it to the overlay, but only actually
@@ -509,7 +932,7 @@ class Stage(Gtk.Window):
         Initially invisible, regardless - its visibility is controlled via its
         own positioning timer.
         """
-        self.clock_widget = ClockWidget(self.away_message, status.screen.get_mouse_monitor(), status.screen.get_low_res_mode())
+        self.clock_widget = ClockWidget(self.away_message, self.pointer_monitor.get_monitor(), status.screen.get_low_res_mode())
         self.add_child_widget(self.clock_widget)
 
         self.floaters.append(self.clock_widget)
@@ -526,7 +949,7 @@ class Stage(Gtk.Window):
         Initially invisible, regardless - its visibility is controlled via its
         own positioning timer.
         """
-        self.albumart_widget = AlbumArt(status.screen.get_mouse_monitor(), status.screen.get_low_res_mode())
+        self.albumart_widget = AlbumArt(self.pointer_monitor.get_monitor(), status.screen.get_low_res_mode())
         self.add_child_widget(self.albumart_widget)
 
         self.floaters.append(self.albumart_widget)
@@ -539,6 +962,7 @@ class Stage(Gtk.Window):
 
         self.add_child_widget(self.osk)
 
+    @timing.traced
     def setup_unlock(self):
         """
         Construct the unlock dialog widget and add it to the overlay.  It will always
@@ -734,8 +1158,19 @@ class Stage(Gtk.Window):
         """
         GtkWidget class motion-event handler.  Delegate to EventHandler
         """
+        self.pointer_monitor.update(event.x_root, event.y_root)
+
         return self.event_handler.on_motion_event(event)
 
+    def do_enter_notify_event(self, event):
+        """
+        GtkWidget class enter-notify-event handler.  Only used to keep track of
+        the pointer - see PointerMonitor.
+        """
+        self.pointer_monitor.update(event.x_root, event.y_root)
+
+        return Gdk.EVENT_PROPAGATE
+
     def do_key_press_event(self, event):
         """
         GtkWidget class key-press-event handler.  Delegate to EventHandler
@@ -782,14 +1217,14 @@ class Stage(Gtk.Window):
         if status.InteractiveDebug:
             return status.screen.get_primary_monitor()
         else:
-            return status.screen.get_mouse_monitor()
+            return self.pointer_monitor.get_monitor()
 
     def maybe_update_layout(self):
         """
         Called on all user events, moves widgets to the currently
         focused monitor if it changes (whichever monitor the mouse is in)
         """
-        current_focus_monitor = status.screen.get_mouse_monitor()
+        current_focus_monitor = self.pointer_monitor.get_monitor()
 
         if self.last_focus_monitor == -1:
             self.last_focus_monitor = current_focus_monitor
@@ -811,198 +1246,155 @@ class Stage(Gtk.Window):
         """
         self.overlay.reorder_overlay(widget, 0)
 
-    def position_overlay_child(self, overlay, child, allocation):
+    def setup_layout_rules(self):
         """
-        Callback for our GtkOverlay, think of this as a mini-
-        window manager for our Stage.
-
-        Depending on what type child is, we position it differently.
-        We always call child.get_preferred_size() whether we plan to use
-        it or not - this prevents allocation warning spew, particularly in
-        Gtk >= 3.20.
+        Our StageLayout is a mini-window manager for the Stage - depending on what type
+        a child is, we position it differently.  Each rule sets the child's allocation,
+        returning True to draw it, or False to skip drawing it.
 
-        Returning True says, yes draw it.  Returning False tells it to skip
-        drawing.
+        A rule is only run when something it depends on has changed - the monitor
+        layout, status.Awake, the focus monitor, the child's natural size, or whatever
+        the (optional) inputs callback returns.
 
         If a new widget type is introduced that spawns directly on the stage,
-        it must have its own handling code here.
+        it must have its own rule here.
         """
-        if isinstance(child, MonitorView):
-            """
-            MonitorView is always the size and position of its assigned monitor.
-            This is calculated and stored by the child in child.rect)
-            """
-            w, h = child.get_preferred_size()
-            allocation.x = child.rect.x
-            allocation.y = child.rect.y
-            allocation.width = child.rect.width
-            allocation.height = child.rect.height
+        self.overlay.add_rule(MonitorView, self.place_monitor_view, self.get_rect_inputs)
+        self.overlay.add_rule(UnlockDialog, self.place_unlock_dialog)
+        self.overlay.add_rule(Floating, self.place_floater, self.get_floater_inputs, self.add_floater_damage)
+        self.overlay.add_rule(AudioPanel, self.place_audio_panel, self.get_rect_inputs)
+        self.overlay.add_rule(InfoPanel, self.place_info_panel, self.get_rect_inputs)
 
-            return True
+        if OnScreenKeyboard:
+            self.overlay.add_rule(OnScreenKeyboard, self.place_osk)
 
-        if isinstance(child, UnlockDialog):
-            """
-            UnlockDialog always shows on the currently focused monitor (the one the
-            mouse is currently in), and is kept centered.
-            """
-            monitor = status.screen.get_mouse_monitor()
-            monitor_rect = status.screen.get_monitor_geometry(monitor)
+    def get_rect_inputs(self, child, monitor):
+        return (child.rect.x, child.rect.y, child.rect.width, child.rect.height)
 
-            min_rect, nat_rect = child.get_preferred_size()
+    def place_monitor_view(self, child, nat_rect, monitor, allocation):
+        """
+        MonitorView is always the size and position of its assigned monitor.
+        This is calculated and stored by the child in child.rect)
+        """
+        allocation.x = child.rect.x
+        allocation.y = child.rect.y
+        allocation.width = child.rect.width
+        allocation.height = child.rect.height
 
-            allocation.width = nat_rect.width
-            allocation.height = nat_rect.height
+        return True
 
-            allocation.x = monitor_rect.x + (monitor_rect.width / 2) - (allocation.width / 2)
-            allocation.y = monitor_rect.y + (monitor_rect.height / 2) - (allocation.height / 2)
+    def place_unlock_dialog(self, child, nat_rect, monitor, allocation):
+        """
+        UnlockDialog always shows on the currently focused monitor (the one the
+        mouse is currently in), and is kept centered.
+        """
+        monitor_rect = status.screen.get_monitor_geometry(monitor)
 
-            return True
+        allocation.width = nat_rect.width
+        allocation.height = nat_rect.height
 
-        if isinstance(child, Floating):
-            """
-            ClockWidget and AlbumArt behave differently depending on if status.Awake is True or not.
+        allocation.x = monitor_rect.x + (monitor_rect.width / 2) - (allocation.width / 2)
+        allocation.y = monitor_rect.y + (monitor_rect.height / 2) - (allocation.height / 2)
 
-            The widgets' halign and valign properties are used to store their gross position on the
-            monitor.  This limits the number of possible positions to (3 * 3 * n_monitors) when our
-            screensaver is not Awake, and the widgets have an internal timer that randomizes halign,
-            valign, and current monitor every so many seconds, calling a queue_resize on itself after
-            each timer tick (which forces this function to run).
-            """
-            if settings.get_allow_floating():
-                if self.floaters_need_update:
-                    alignments = [int(Gtk.Align.START), int(Gtk.Align.END), int(Gtk.Align.CENTER)]
-                    n_monitors = status.screen.get_n_monitors()
-                    alignment_positions = []
-                    for i in range(n_monitors):
-                        for halign in alignments:
-                            for valign in alignments:
-                                alignment_positions.append((i, halign, valign))
-
-                    for floater in self.floaters:
-                        position = alignment_positions.pop(random.randint(0, len(alignment_positions) - 1))
-                        floater.set_next_position(*position)
-
-                    self.floaters_need_update = False
-
-                child.apply_next_position()
-
-            min_rect, nat_rect = child.get_preferred_size()
-            current_monitor = child.current_monitor
-            monitor_rect = status.screen.get_monitor_geometry(current_monitor)
-            region_w = monitor_rect.width / 3
-            region_h = monitor_rect.height / 3
-
-            if status.Awake:
-                current_monitor = status.screen.get_mouse_monitor()
-                monitor_rect = status.screen.get_monitor_geometry(current_monitor)
-                region_w = monitor_rect.width / 3
-                region_h = monitor_rect.height / 3
-
-                """
-                If we're Awake, force the clock to track to the active monitor, and be aligned to
-                the left-center.  The albumart widget aligns right-center.
-                """
-                unlock_mw, unlock_nw = self.unlock_dialog.get_preferred_width()
-                """
-                If, for whatever reason, we need more than 1/3 of the screen to fully display
-                the unlock dialog, reduce our available region width to accommodate it, reducing
-                the allocation for the floating widgets as required.
-                """
-                if unlock_nw > region_w:
-                    region_w = (monitor_rect.width - unlock_nw) / 2
-
-                child.set_awake_position(current_monitor)
-                child.apply_next_position()
-
-            # Restrict the widget size to the allowable region sizes if necessary.
-            allocation.width = min(nat_rect.width, region_w)
-            allocation.height = min(nat_rect.height, region_h)
-
-            # Calculate padding required to center widgets within their particular 1/9th of the monitor
-            padding_left = padding_right = (region_w - allocation.width) / 2
-            padding_top = padding_bottom = (region_h - allocation.height) / 2
-
-            halign = child.get_halign()
-            valign = child.get_valign()
-
-            if halign == Gtk.Align.START:
-                allocation.x = monitor_rect.x + padding_left
-            elif halign == Gtk.Align.CENTER:
-                allocation.x = monitor_rect.x + (monitor_rect.width / 2) - (allocation.width / 2)
-            elif halign == Gtk.Align.END:
-                allocation.x = monitor_rect.x + monitor_rect.width - allocation.width - padding_right
-
-            if valign == Gtk.Align.START:
-                allocation.y = monitor_rect.y + padding_top
-            elif valign == Gtk.Align.CENTER:
-                allocation.y = monitor_rect.y + (monitor_rect.height / 2) - (allocation.height / 2)
-            elif valign == Gtk.Align.END:
-                allocation.y = monitor_rect.y + monitor_rect.height - allocation.height - padding_bottom
-
-            return True
-
-        if isinstance(child, AudioPanel):
-            """
-            The AudioPanel is only shown when Awake, and attaches
-            itself to the upper-left corner of the active monitor.
-            """
-            min_rect, nat_rect = child.get_preferred_size()
-
-            if status.Awake:
-                current_monitor = status.screen.get_mouse_monitor()
-                monitor_rect = status.screen.get_monitor_geometry(current_monitor)
-                allocation.x = monitor_rect.x
-                allocation.y = monitor_rect.y
-                allocation.width = nat_rect.width
-                allocation.height = nat_rect.height
-            else:
-                allocation.x = child.rect.x
-                allocation.y = child.rect.y
-                allocation.width = nat_rect.width
-                allocation.height = nat_rect.height
+        return True
 
-            return True
+    def get_floater_inputs(self, child, monitor):
+        """
+        ClockWidget and AlbumArt behave differently depending on if status.Awake is True or not.
 
-        if isinstance(child, InfoPanel):
-            """
-            The InfoPanel can be shown while not Awake, but will only appear if a) We have received
-            notifications while the screensaver is running, or b) we're either on battery
-            or plugged in but with a non-full battery.  It attaches itself to the upper-right
-            corner of the monitor.
-            """
-            min_rect, nat_rect = child.get_preferred_size()
-
-            if status.Awake:
-                current_monitor = status.screen.get_mouse_monitor()
-                monitor_rect = status.screen.get_monitor_geometry(current_monitor)
-                allocation.x = monitor_rect.x + monitor_rect.width - nat_rect.width
-                allocation.y = monitor_rect.y
-                allocation.width = nat_rect.width
-                allocation.height = nat_rect.height
-            else:
-                allocation.x = child.rect.x + child.rect.width - nat_rect.width
-                allocation.y = child.rect.y
-                allocation.width = nat_rect.width
-                allocation.height = nat_rect.height
+        The widgets' halign and valign properties are used to store their gross position on the
+        monitor.  This limits the number of possible positions to (3 * 3 * n_monitors) when our
+        screensaver is not Awake - update_floaters() moves them to a new slot every so many
+        seconds.
+
+        When Awake, where they go also depends on the width of the unlock dialog.
+        """
+        if status.Awake:
+            unlock_nw = self.unlock_dialog.get_preferred_width()[1]
+        else:
+            unlock_nw = 0
 
-            return True
+        return (child.current_monitor, child.get_halign(), child.get_valign(), unlock_nw)
 
-        if isinstance(child, OnScreenKeyboard):
+    def place_floater(self, child, nat_rect, monitor, allocation):
+        """
+        If we're Awake, force the clock to track to the active monitor, and be aligned to
+        the left-center.  The albumart widget aligns right-center.
+        """
+        region_w = None
+
+        if status.Awake:
+            child.set_awake_position(monitor)
+            child.apply_next_position()
+
+            monitor_rect = self.floater_slots.get_monitor_rect(child.current_monitor)
+            unlock_nw = self.unlock_dialog.get_preferred_width()[1]
             """
-            The InfoPanel can be shown while not Awake, but will only appear if a) We have received
-            notifications while the screensaver is running, or b) we're either on battery
-            or plugged in but with a non-full battery.  It attaches itself to the upper-right
-            corner of the monitor.
+            If, for whatever reason, we need more than 1/3 of the screen to fully display
+            the unlock dialog, reduce our available region width to accommodate it, reducing
+            the allocation for the floating widgets as required.
             """
-            min_rect, nat_rect = child.get_preferred_size()
+            if unlock_nw > monitor_rect.width / 3:
+                region_w = (monitor_rect.width - unlock_nw) / 2
+
+        allocation.x, allocation.y, allocation.width, allocation.height = \
+            self.floater_slots.get_allocation(child.current_monitor,
+                                              child.get_halign(),
+                                              child.get_valign(),
+                                              nat_rect.width,
+                                              nat_rect.height,
+                                              region_w)
 
-            current_monitor = status.screen.get_mouse_monitor()
-            monitor_rect = status.screen.get_monitor_geometry(current_monitor)
+        return True
+
+    def place_audio_panel(self, child, nat_rect, monitor, allocation):
+        """
+        The AudioPanel is only shown when Awake, and attaches
+        itself to the upper-left corner of the active monitor.
+        """
+        if status.Awake:
+            monitor_rect = status.screen.get_monitor_geometry(monitor)
             allocation.x = monitor_rect.x
-            allocation.y = monitor_rect.y + monitor_rect.height - (monitor_rect.height / 3)
-            allocation.width = monitor_rect.width
-            allocation.height = monitor_rect.height / 3
+            allocation.y = monitor_rect.y
+            allocation.width = nat_rect.width
+            allocation.height = nat_rect.height
+        else:
+            allocation.x = child.rect.x
+            allocation.y = child.rect.y
+            allocation.width = nat_rect.width
+            allocation.height = nat_rect.height
 
-            return True
+        return True
 
-        return False
+    def place_info_panel(self, child, nat_rect, monitor, allocation):
+        """
+        The InfoPanel can be shown while not Awake, but will only appear if a) We have received
+        notifications while the screensaver is running, or b) we're either on battery
+        or plugged in but with a non-full battery.  It attaches itself to the upper-right
+        corner of the monitor.
+        """
+        if status.Awake:
+            monitor_rect = status.screen.get_monitor_geometry(monitor)
+            allocation.x = monitor_rect.x + monitor_rect.width - nat_rect.width
+            allocation.y = monitor_rect.y
+            allocation.width = nat_rect.width
+            allocation.height = nat_rect.height
+        else:
+            allocation.x = child.rect.x + child.rect.width - nat_rect.width
+            allocation.y = child.rect.y
+            allocation.width = nat_rect.width
+            allocation.height = nat_rect.height
+
+        return True
+
+    def place_osk(self, child, nat_rect, monitor, allocation):
+        """
+        The OnScreenKeyboard covers the bottom third of the active monitor.
+        """
+        monitor_rect = status.screen.get_monitor_geometry(monitor)
+        allocation.x = monitor_rect.x
+        allocation.y = monitor_rect.y + monitor_rect.height - (monitor_rect.height / 3)
+        allocation.width = monitor_rect.width
+        allocation.height = monitor_rect.height / 3
+
+        return True
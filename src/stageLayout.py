@@ -0,0 +1,123 @@
+#!/usr/bin/python3
+
+from gi.repository import Gtk
+
+import status
+
+class StageLayout(Gtk.Overlay):
+    """
+    The container for everything on our Stage - a GtkOverlay that positions its
+    children itself, using placement rules registered (by child type) with add_rule().
+
+    A rule is called as:
+
+        place(child, nat_rect, monitor, allocation)
+
+    with the child's natural size and the monitor the mouse is in (the focus monitor,
+    from pointer_monitor), and sets allocation, returning False if the child shouldn't
+    be drawn.  It can also have an inputs callback - inputs(child, monitor) - returning
+    anything else the child's position depends on (its own rect, its current alignment,
+    etc.), and a placed callback - placed(child, allocation) - called with every
+    allocation the child is given, whether it was worked out again or not.
+
+    Allocations are remembered per child, along with everything they were worked out
+    from - the monitor layout, whether we're Awake, the focus monitor, the child's
+    natural size and any inputs of its own.  A child is only placed again when one of
+    those has changed, the rest keep their previous allocation.
+    """
+    def __init__(self, pointer_monitor):
+        super(StageLayout, self).__init__()
+
+        self.pointer_monitor = pointer_monitor
+        self.layout_key = None
+        self.rules = {}
+        self.child_rules = {}
+        self.allocations = {}
+
+        self.connect("get-child-position", self.on_get_child_position)
+        self.connect("remove", self.on_child_removed)
+
+    def add_rule(self, child_type, place, inputs=None, placed=None):
+        self.rules[child_type] = (place, inputs, placed)
+        self.child_rules = {}
+        self.allocations = {}
+
+    def set_layout_key(self, layout_key):
+        """
+        Called by the Stage whenever it's been (re)built for a monitor layout.
+        """
+        if layout_key != self.layout_key:
+            self.layout_key = layout_key
+            self.allocations = {}
+
+    def invalidate(self, child=None):
+        """
+        Forgets the allocation of child (or every child), so it's placed again next time.
+        """
+        if child is None:
+            self.allocations = {}
+        else:
+            self.allocations.pop(child, None)
+
+    def get_rule(self, child):
+        try:
+            return self.child_rules[child]
+        except KeyError:
+            pass
+
+        rule = None
+
+        for child_type in type(child).__mro__:
+            if child_type in self.rules:
+                rule = self.rules[child_type]
+                break
+
+        self.child_rules[child] = rule
+
+        return rule
+
+    def on_get_child_position(self, overlay, child, allocation):
+        """
+        We always call child.get_preferred_size() whether we plan to use
+        it or not - this prevents allocation warning spew, particularly in
+        Gtk >= 3.20.
+        """
+        min_rect, nat_rect = child.get_preferred_size()
+
+        rule = self.get_rule(child)
+
+        if rule is None:
+            return False
+
+        place, inputs, placed = rule
+
+        monitor = self.pointer_monitor.get_monitor()
+
+        def get_key():
+            return (status.Awake,
+                    monitor,
+                    nat_rect.width,
+                    nat_rect.height,
+                    inputs(child, monitor) if inputs is not None else None)
+
+        key = get_key()
+        cached = self.allocations.get(child)
+
+        if cached is not None and cached[0] == key:
+            rect, visible = cached[1:]
+            allocation.x, allocation.y, allocation.width, allocation.height = rect
+        else:
+            visible = place(child, nat_rect, monitor, allocation)
+
+            # Placing can move the child itself (floaters take up their Awake position),
+            # so remember the inputs it was left with.
+            self.allocations[child] = (get_key(), (allocation.x, allocation.y, allocation.width, allocation.height), visible)
+
+        if placed is not None and visible:
+            placed(child, allocation)
+
+        return visible
+
+    def on_child_removed(self, overlay, child):
+        self.child_rules.pop(child, None)
+        self.allocations.pop(child, None)
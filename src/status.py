@@ -14,6 +14,17 @@ focusWidgets = []
 LockEnabled = True
 UseFallback = True
 
+# Hide and reset the Stage when deactivating, instead of destroying it, so it can simply be shown again
+# the next time we activate.  See ScreensaverManager.retain_stage().
+RetainStage = False
+
+# Stay running when idle, instead of exiting after the inactivity timeout, and trim our memory use
+# while we wait.  MemoryBudget (in bytes, 0 for none) is the most we'll use while idle before giving
+# up and exiting after all.  See ScreensaverManager.trim_memory().
+Resident = False
+MemoryBudget = 0
+FreezeGC = False
+
 # Enables extra PAM/authentication/notification debugging
 # TODO: We do a *lot* of logging now, we should just use a debug() function that checks
 # for debug mode internally, instead of 'if status.Debug' everywhere.
@@ -0,0 +1,132 @@
+#!/usr/bin/python3
+
+# Shared by the benchmark scripts in this directory - starting Xvfb and a private
+# session bus, running the screensaver on them, and talking to it over dbus.
+
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+from gi.repository import Gio, GLib
+
+SS_SERVICE = "org.cinnamon.ScreenSaver"
+SS_PATH = "/org/cinnamon/ScreenSaver"
+SS_INTERFACE = "org.cinnamon.ScreenSaver"
+
+SESSION_ENV = "CS_BENCHMARK_PRIVATE_BUS"
+
+class Screensaver:
+    """
+    Runs the screensaver process with --print-timings, and collects the lines it prints
+    starting with prefix ("cs-timing:" or "cs-counter:").
+    """
+    def __init__(self, command, extra_args, env, prefix):
+        argv = [command, "--hold", "--no-fallback", "--print-timings"] + extra_args
+        self.proc = subprocess.Popen(argv,
+                                     env=env,
+                                     stdout=subprocess.PIPE,
+                                     stderr=subprocess.STDOUT,
+                                     universal_newlines=True)
+        self.prefix = prefix
+        self.lines = queue.Queue()
+
+        self.reader = threading.Thread(target=self.read_output, daemon=True)
+        self.reader.start()
+
+    def read_output(self):
+        for line in self.proc.stdout:
+            if line.startswith(self.prefix):
+                self.lines.put(line)
+
+    def collect(self):
+        """
+        Returns a (name, value) pair for each line printed since the last call - value
+        is left as a string.
+        """
+        values = []
+
+        while True:
+            try:
+                line = self.lines.get_nowait()
+            except queue.Empty:
+                break
+
+            try:
+                prefix, name, value = line.split()
+                values.append((name, value))
+            except ValueError:
+                pass
+
+        return values
+
+    def stop(self):
+        if self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(5)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+
+def run_in_private_bus():
+    """
+    Everything needs to run against a bus of our own - re-run the calling script inside
+    one, unless we already are.
+    """
+    if os.environ.get(SESSION_ENV) is None:
+        env = dict(os.environ)
+        env[SESSION_ENV] = "1"
+        os.execvpe("dbus-run-session", ["dbus-run-session", "--", sys.executable] + sys.argv, env)
+
+def start_xvfb(display, screen):
+    xvfb = subprocess.Popen(["Xvfb", display, "-screen", "0", screen, "-nolisten", "tcp"],
+                            stdout=subprocess.DEVNULL,
+                            stderr=subprocess.DEVNULL)
+
+    socket = "/tmp/.X11-unix/X%s" % display.lstrip(":")
+
+    for i in range(100):
+        if os.path.exists(socket):
+            return xvfb
+        if xvfb.poll() is not None:
+            break
+        time.sleep(0.1)
+
+    xvfb.kill()
+    print("Xvfb failed to start on display %s" % display)
+    sys.exit(1)
+
+def get_session_env(display):
+    """
+    The environment to run the screensaver (and anything else using the display) with.
+    """
+    env = dict(os.environ)
+    env["DISPLAY"] = display
+    env["XDG_SESSION_TYPE"] = "x11"
+    env["GSETTINGS_BACKEND"] = "memory"
+    env["NO_AT_BRIDGE"] = "1"
+
+    return env
+
+def call(bus, method, params=None, timeout=30000):
+    return bus.call_sync(SS_SERVICE, SS_PATH, SS_INTERFACE, method,
+                         params, None, Gio.DBusCallFlags.NO_AUTO_START, timeout, None)
+
+def wait_for_service(bus, proc, timeout=30):
+    end = time.monotonic() + timeout
+
+    while time.monotonic() < end:
+        if proc.poll() is not None:
+            return False
+
+        owner = bus.call_sync("org.freedesktop.DBus", "/org/freedesktop/DBus", "org.freedesktop.DBus",
+                              "NameHasOwner", GLib.Variant("(s)", (SS_SERVICE,)),
+                              None, Gio.DBusCallFlags.NONE, -1, None)
+        if owner.unpack()[0]:
+            return True
+
+        time.sleep(0.05)
+
+    return False
@@ -238,6 +238,18 @@ class UnlockDialog(BaseWindow):
         self.auth_client.cancel()
         self.clear_entry()
 
+    def reset(self):
+        """
+        Returns the dialog to the state it was constructed in - no helper process,
+        no messages, and the entry hidden until the next authentication prompt.
+        """
+        self.cancel()
+        self.set_busy(False)
+        self.auth_message_label.set_text("")
+
+        self.password_entry.hide()
+        self.auth_unlock_button.hide()
+
     def queue_key_event(self, event):
         """
         Takes a propagated key event from the stage and passes it to the entry widget,
@@ -1,8 +1,10 @@
 #!/usr/bin/python3
 
-from gi.repository import Gdk
+from gi.repository import Gdk, GLib
+import time
 
 import status
+from util import timing
 from util.keybindings import KeyBindings
 
 MOTION_THRESHOLD = 100
@@ -15,29 +17,86 @@ class EventHandler:
 
     All events are stopped from passing beyond this point, to prevent
     any unintended events from propagating to Cinnamon or Muffin.
+
+    While we're Awake, pointer motion is only passed on as user activity
+    once per frame of the widget's frame clock - a fast mouse can send
+    hundreds of motion events a second, and each one would otherwise restart
+    the unlock timeout and check the layout.
     """
-    def __init__(self, manager):
+    def __init__(self, manager, widget):
         self.manager = manager
+        self.widget = widget
         self.keybindings_handler = KeyBindings(manager)
 
         self.last_x = -1
         self.last_y = -1
 
+        self.activity_tick_id = 0
+        self.pending_motion_events = 0
+
+    def reset(self):
+        """
+        Forget the last pointer position, so the motion threshold applies
+        again from the start.
+        """
+        self.last_x = -1
+        self.last_y = -1
+
+        self.cancel_queued_activity()
 
     def on_user_activity(self):
         """
         Any user event is a 'wake' event, and is propagated to the stage
         in order to reset our unlock cancellation timer.
         """
+        self.cancel_queued_activity()
+
+        started = time.monotonic()
+
         self.manager.simulate_user_activity()
 
+        timing.gauge("user_activity_us", (time.monotonic() - started) * 1000000)
+
+    def queue_user_activity(self):
+        """
+        Passes pointer motion on as user activity at the next frame, merged with any
+        other motion that arrives before then.
+        """
+        self.pending_motion_events += 1
+
+        if self.activity_tick_id > 0:
+            return
+
+        if not self.widget.get_mapped():
+            # No frame clock to wait for.
+            self.on_user_activity()
+            return
+
+        self.activity_tick_id = self.widget.add_tick_callback(self.on_activity_tick)
+
+    def on_activity_tick(self, widget, frame_clock):
+        self.activity_tick_id = 0
+
+        timing.gauge("user_activity_merged", self.pending_motion_events)
+
+        self.on_user_activity()
+
+        return GLib.SOURCE_REMOVE
+
+    def cancel_queued_activity(self):
+        if self.activity_tick_id > 0:
+            self.widget.remove_tick_callback(self.activity_tick_id)
+            self.activity_tick_id = 0
+
+        self.pending_motion_events = 0
+
     def on_motion_event(self, event):
         """
         Any mouse movement is sent here - there is a threshold to reach when
         asleep, so that inadvertent motion doesn't wake the system unintentionally.
         """
         if status.Awake:
-            self.on_user_activity()
+            self.queue_user_activity()
             return Gdk.EVENT_PROPAGATE
 
         if self.last_x == -1 or self.last_y == -1:
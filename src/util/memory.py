@@ -0,0 +1,50 @@
+#!/usr/bin/python3
+
+import ctypes
+import ctypes.util
+import gc
+import os
+
+# Helpers for resident mode (--resident), where we stay running between activations
+# and give memory back while idle, instead of exiting.  See ScreensaverManager.trim_memory().
+
+try:
+    _malloc_trim = ctypes.CDLL(ctypes.util.find_library("c")).malloc_trim
+except (OSError, AttributeError, TypeError):
+    # Not glibc
+    _malloc_trim = None
+
+def get_rss():
+    """
+    Returns our resident set size, in bytes, or 0 if it can't be read.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+def trim(freeze=False):
+    """
+    Runs a full garbage collection, and asks malloc to return any free memory at the
+    top of the heap to the system.  If freeze is True, everything that survives is
+    moved to the permanent generation, so the collector doesn't keep walking it.
+
+    Returns our resident set size afterwards.
+    """
+    # Objects frozen last time around may be garbage by now (an old Stage, for instance).
+    if freeze:
+        gc.unfreeze()
+
+    gc.collect()
+
+    if freeze:
+        gc.freeze()
+
+    if _malloc_trim is not None:
+        _malloc_trim(0)
+
+    return get_rss()
+
+def format_size(size):
+    return "%.1f MB" % (size / (1024 * 1024))
@@ -0,0 +1,114 @@
+#!/usr/bin/python3
+
+import bisect
+
+import status
+from util import timing
+
+class PointerMonitor:
+    """
+    Keeps track of which monitor the mouse pointer is in, from the root coordinates of
+    the motion and crossing events the Stage receives, so finding the focus monitor
+    doesn't need an XQueryPointer (a round trip to the X server, and possibly over the
+    network) each time.
+
+    Monitors are found using a grid built from the edges of every monitor rect - each
+    cell of the grid is either entirely in one monitor, or in none, so a point's monitor
+    is two binary searches away.
+
+    Until an event has told us where the pointer is (right after activating), we ask
+    CsScreen, once.
+    """
+    def __init__(self):
+        self.xs = []
+        self.ys = []
+        self.cells = []
+
+        self.x = None
+        self.y = None
+        self.monitor = -1
+
+    def update_layout(self):
+        """
+        Rebuilds the index from status.screen - this must be called whenever the monitor
+        layout changes.
+        """
+        rects = [status.screen.get_monitor_geometry(i) for i in range(status.screen.get_n_monitors())]
+
+        self.xs = sorted(set([r.x for r in rects] + [r.x + r.width for r in rects]))
+        self.ys = sorted(set([r.y for r in rects] + [r.y + r.height for r in rects]))
+
+        self.cells = []
+
+        for row in range(len(self.ys) - 1):
+            y = (self.ys[row] + self.ys[row + 1]) / 2
+            cells = []
+
+            for col in range(len(self.xs) - 1):
+                x = (self.xs[col] + self.xs[col + 1]) / 2
+                monitor = -1
+
+                # The first monitor wins where they overlap (cloned outputs), like CsScreen.
+                for i, r in enumerate(rects):
+                    if r.x <= x < r.x + r.width and r.y <= y < r.y + r.height:
+                        monitor = i
+                        break
+
+                cells.append(monitor)
+
+            self.cells.append(cells)
+
+        if self.x is not None:
+            self.monitor = self.lookup(self.x, self.y)
+        else:
+            self.monitor = -1
+
+    def reset(self):
+        """
+        Forgets where the pointer is - it can move anywhere while we're not watching.
+        """
+        self.x = None
+        self.y = None
+        self.monitor = -1
+
+    def lookup(self, x, y):
+        """
+        Returns the monitor containing the point x, y, or 0 if none does (as CsScreen would).
+        """
+        col = bisect.bisect_right(self.xs, x) - 1
+        row = bisect.bisect_right(self.ys, y) - 1
+
+        if 0 <= row < len(self.cells) and 0 <= col < len(self.cells[row]):
+            monitor = self.cells[row][col]
+
+            if monitor >= 0:
+                return monitor
+
+        return 0
+
+    def update(self, x_root, y_root):
+        """
+        Called with the root coordinates of each pointer event.  Returns True if the
+        pointer has moved to a different monitor.
+        """
+        self.x = x_root
+        self.y = y_root
+
+        if not self.cells:
+            # No layout yet, update_layout() will find it.
+            return False
+
+        monitor = self.lookup(x_root, y_root)
+
+        if monitor != self.monitor:
+            self.monitor = monitor
+            return True
+
+        return False
+
+    def get_monitor(self):
+        if self.monitor == -1:
+            timing.count("pointer_query")
+            self.monitor = status.screen.get_mouse_monitor()
+
+        return self.monitor
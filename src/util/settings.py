@@ -8,9 +8,10 @@ from gi.repository import Gio
 
 bg_settings = Gio.Settings(schema_id="org.cinnamon.desktop.background")
 
-# Screensaver settings - we have no need to listen to changes here,
-# They're read anew each time they're used, and while the screensaver
-# is active, the user won't be changing them.
+# Screensaver settings - these are read when they're used (mostly when
+# the Stage is constructed).  A retained Stage listens for changes to these
+# (and the interface, keyboard and a11y settings below), to know it needs
+# to be rebuilt.
 
 ss_settings = Gio.Settings(schema_id="org.cinnamon.desktop.screensaver")
 DEFAULT_MESSAGE_KEY = "default-message"
@@ -35,8 +36,7 @@ ALLOW_MEDIA_CONTROL = "allow-media-control"
 SHOW_INFO_PANEL = "show-info-panel"
 FLOATING_WIDGETS = "floating-widgets"
 
-# Interface settings - the same logic applies here as above - we don't
-# need to listen to changes to these.
+# Interface settings - the same logic applies here as above.
 if_settings = Gio.Settings(schema_id="org.cinnamon.desktop.interface")
 KBD_LAYOUT_SHOW_FLAGS = "keyboard-layout-show-flags"
 KBD_LAYOUT_USE_CAPS = "keyboard-layout-use-upper"
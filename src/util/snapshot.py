@@ -0,0 +1,139 @@
+#!/usr/bin/python3
+
+import json
+import os
+
+from gi.repository import GLib, Gio, Gdk
+
+from util.utils import DEBUG
+
+# A small on-disk cache of things we'd otherwise have to work out again at every cold start -
+# whether the theme supports us, the user's real name and face, their input sources and whether
+# fractional scaling is in use.  None of these change often.
+#
+# Each section is stored along with a key describing what it was computed from (the theme name
+# and modification time, the user name, the monitor configuration).  lookup() only returns a
+# value whose key still matches, so we can use it right away.  The real value is still looked up
+# afterwards, asynchronously, and stored again if it's changed - the file is only rewritten then,
+# at idle, and without blocking.
+#
+# Bump VERSION whenever the format of any section changes, older files are ignored.
+
+VERSION = 1
+
+_data = None
+_save_id = 0
+
+def get_path():
+    return os.path.join(GLib.get_user_cache_dir(), "cinnamon-screensaver", "startup-snapshot.json")
+
+def _load():
+    global _data
+
+    if _data is not None:
+        return _data
+
+    _data = {}
+
+    try:
+        with open(get_path(), "r") as f:
+            data = json.load(f)
+
+        if data.get("version") == VERSION and data.get("user") == GLib.get_user_name():
+            _data = data.get("sections", {})
+        else:
+            DEBUG("snapshot: ignoring snapshot from a different version or user")
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, AttributeError) as e:
+        print("Could not read startup snapshot, ignoring it: %s" % str(e), flush=True)
+
+    return _data
+
+def lookup(section, key):
+    """
+    Returns the value stored for section, if it was stored with the same key - otherwise None.
+    """
+    entry = _load().get(section)
+
+    if entry is None or entry.get("key") != key:
+        DEBUG("snapshot: no current entry for '%s'" % section)
+        return None
+
+    return entry.get("value")
+
+def store(section, key, value):
+    """
+    Replaces what's stored for section, and queues writing the snapshot out if anything changed.
+    """
+    data = _load()
+
+    entry = { "key": key, "value": value }
+
+    try:
+        # Round trip, so tuples and lists compare equal.
+        entry = json.loads(json.dumps(entry))
+    except (TypeError, ValueError) as e:
+        print("Could not store '%s' in the startup snapshot: %s" % (section, str(e)), flush=True)
+        return
+
+    if data.get(section) == entry:
+        return
+
+    DEBUG("snapshot: updating '%s'" % section)
+
+    data[section] = entry
+    _queue_save()
+
+def _queue_save():
+    global _save_id
+
+    if _save_id > 0:
+        return
+
+    _save_id = GLib.idle_add(_save, priority=GLib.PRIORITY_LOW)
+
+def _save():
+    global _save_id
+    _save_id = 0
+
+    contents = json.dumps({ "version": VERSION,
+                            "user": GLib.get_user_name(),
+                            "sections": _data })
+
+    try:
+        os.makedirs(os.path.dirname(get_path()), exist_ok=True)
+
+        Gio.File.new_for_path(get_path()).replace_contents_bytes_async(GLib.Bytes.new(contents.encode()),
+                                                                       None,
+                                                                       False,
+                                                                       Gio.FileCreateFlags.PRIVATE,
+                                                                       None,
+                                                                       _on_saved)
+    except (OSError, GLib.Error) as e:
+        print("Could not write startup snapshot: %s" % str(e), flush=True)
+
+    return False
+
+def _on_saved(file, res, data=None):
+    try:
+        file.replace_contents_finish(res)
+    except GLib.Error as e:
+        print("Could not write startup snapshot: %s" % e.message, flush=True)
+
+def get_monitor_key():
+    """
+    Describes the current monitor configuration (geometry, scale and model of each monitor).
+    """
+    display = Gdk.Display.get_default()
+    monitors = []
+
+    for i in range(display.get_n_monitors()):
+        monitor = display.get_monitor(i)
+        rect = monitor.get_geometry()
+
+        monitors.append("%s:%d,%d,%dx%d@%d" % (monitor.get_model(),
+                                               rect.x, rect.y, rect.width, rect.height,
+                                               monitor.get_scale_factor()))
+
+    return ";".join(monitors)
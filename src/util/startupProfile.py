@@ -0,0 +1,148 @@
+#!/usr/bin/python3
+
+import sys
+import time
+
+# Import profiling for --profile-startup.
+#
+# This needs to be installed before anything else is imported, so the main script
+# checks for the argument itself, before argparse ever sees it.  Once installed, every
+# module imported from then on is timed (modules imported before that aren't seen), and
+# report() prints what was imported since the last report, slowest first.  Typelibs
+# (gi.repository.*) are listed separately - the time shown for them is loading and
+# wrapping the typelib, which makes up most of the cost of importing them.
+#
+# Only imports using a finder with find_spec() are timed - this covers regular modules,
+# and typelibs with any recent pygobject.
+
+Installed = False
+
+_start_time = time.monotonic()
+
+_records = {}
+_order = []
+_reported = 0
+_stack = []
+
+class _ProfilingLoader:
+    """
+    Wraps a module's real loader to time creating and executing the module.
+    """
+    def __init__(self, loader):
+        self._loader = loader
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        create_module = getattr(self._loader, "create_module", None)
+
+        if create_module is None:
+            return None
+
+        return _timed(spec.name, create_module, spec)
+
+    def exec_module(self, module):
+        _timed(module.__name__, self._loader.exec_module, module)
+
+class _ProfilingFinder:
+    """
+    Sits at the front of sys.meta_path, and asks the other finders for a spec.  If a
+    spec's loader supports exec_module(), it's wrapped with a _ProfilingLoader.
+    """
+    def find_spec(self, fullname, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self:
+                continue
+
+            find_spec = getattr(finder, "find_spec", None)
+            if find_spec is None:
+                continue
+
+            spec = find_spec(fullname, path, target)
+
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                    spec.loader = _ProfilingLoader(spec.loader)
+
+                return spec
+
+        return None
+
+def _timed(name, func, *args):
+    # Time spent in nested imports is added to the parent's children total, so each
+    # record has both its own (self) time, and the total including everything it imported.
+    children = [0.0]
+    _stack.append(children)
+
+    start = time.monotonic()
+
+    try:
+        return func(*args)
+    finally:
+        total = time.monotonic() - start
+
+        _stack.pop()
+        if _stack:
+            _stack[-1][0] += total
+
+        try:
+            record = _records[name]
+        except KeyError:
+            record = _records[name] = [0.0, 0.0]
+            _order.append(name)
+
+        record[0] += total - children[0]
+        record[1] += total
+
+def install():
+    global Installed
+
+    if Installed:
+        return
+
+    sys.meta_path.insert(0, _ProfilingFinder())
+    Installed = True
+
+def report(title):
+    """
+    Prints the modules and typelibs imported since the last report.
+    """
+    global _reported
+
+    if not Installed:
+        return
+
+    names = _order[_reported:]
+    _reported = len(_order)
+
+    modules = [name for name in names if not name.startswith("gi.repository.")]
+    typelibs = [name for name in names if name.startswith("gi.repository.")]
+
+    total = sum(_records[name][0] for name in names)
+
+    print("", flush=True)
+    print("Startup profile - %s (%.1f ms since start)" % (title, (time.monotonic() - _start_time) * 1000.0))
+    print("%d modules and %d typelibs imported, %.1f ms total" % (len(modules), len(typelibs), total * 1000.0))
+
+    for (heading, group) in (("Modules", modules), ("Typelibs", typelibs)):
+        if not group:
+            continue
+
+        print("")
+        print("  %-40s %10s %10s" % (heading, "self ms", "total ms"))
+
+        for name in sorted(group, key=lambda n: _records[n][0], reverse=True):
+            self_time, total_time = _records[name]
+            print("  %-40s %10.2f %10.2f" % (name, self_time * 1000.0, total_time * 1000.0))
+
+    print("", flush=True)
+
+def mark(title):
+    """
+    Prints how long it's been since the profiler was imported.
+    """
+    if not Installed:
+        return
+
+    print("Startup profile - %s: %.1f ms since start" % (title, (time.monotonic() - _start_time) * 1000.0), flush=True)
@@ -0,0 +1,149 @@
+#!/usr/bin/python3
+
+import cairo
+import hashlib
+import mmap
+import os
+import struct
+
+from util.utils import DEBUG
+
+# An on-disk cache of rendered cairo image surfaces, so a new process can show something it
+# rendered before without decoding or scaling anything.
+#
+# Each surface is kept in its own file, named after a hash of its key - a small header, followed
+# by the surface's pixels exactly as cairo stores them:
+#
+#     magic, version, cairo format, width, height, stride, device scale (native byte order)
+#
+# Loading one just maps the file (privately, so nothing can write through to it) and wraps a
+# cairo surface around the mapping - pixels are only read from disk as they're drawn.  Files
+# are written to a temporary name and renamed into place, so a file that's mapped is never
+# changed underneath us.
+#
+# The least recently used files are removed once the cache grows past its size limit.
+
+MAGIC = b"CSSURFC\0"
+VERSION = 1
+
+HEADER = struct.Struct("=8sIiiiii")
+HEADER_SIZE = 64
+
+class SurfaceCache:
+    def __init__(self, path, max_size):
+        self.path = path
+        self.max_size = max_size
+
+    def get_filename(self, key):
+        return os.path.join(self.path, hashlib.sha1(repr(key).encode()).hexdigest())
+
+    def load(self, key):
+        """
+        Returns the surface stored for key, or None.
+        """
+        filename = self.get_filename(key)
+
+        try:
+            with open(filename, "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            DEBUG("surface cache: could not map %s: %s" % (filename, str(e)))
+            return None
+
+        try:
+            magic, version, fmt, width, height, stride, scale = HEADER.unpack_from(data)
+        except struct.error:
+            magic = None
+
+        if magic != MAGIC or version != VERSION or len(data) != HEADER_SIZE + (stride * height):
+            DEBUG("surface cache: removing invalid file %s" % filename)
+            data.close()
+            self.remove(filename)
+            return None
+
+        surface = cairo.ImageSurface.create_for_data(memoryview(data)[HEADER_SIZE:], fmt, width, height, stride)
+        surface.set_device_scale(scale, scale)
+
+        try:
+            # Eviction goes by modification time.
+            os.utime(filename)
+        except OSError:
+            pass
+
+        return surface
+
+    def store(self, key, surface):
+        """
+        Writes surface out for key.  This only does file operations, so it can be
+        called from a worker thread.
+        """
+        if not isinstance(surface, cairo.ImageSurface):
+            return
+
+        filename = self.get_filename(key)
+        tmp_filename = filename + ".tmp"
+
+        scale_x, scale_y = surface.get_device_scale()
+
+        header = HEADER.pack(MAGIC,
+                             VERSION,
+                             int(surface.get_format()),
+                             surface.get_width(),
+                             surface.get_height(),
+                             surface.get_stride(),
+                             int(scale_x))
+
+        try:
+            os.makedirs(self.path, mode=0o700, exist_ok=True)
+
+            fd = os.open(tmp_filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+
+            with os.fdopen(fd, "wb") as f:
+                f.write(header.ljust(HEADER_SIZE, b"\0"))
+                f.write(surface.get_data())
+
+            os.replace(tmp_filename, filename)
+        except OSError as e:
+            print("Could not write %s to the surface cache: %s" % (filename, str(e)), flush=True)
+            self.remove(tmp_filename)
+            return
+
+        DEBUG("surface cache: stored %s" % filename)
+
+        self.evict()
+
+    def evict(self):
+        try:
+            entries = []
+
+            for name in os.listdir(self.path):
+                if name.endswith(".tmp"):
+                    continue
+
+                filename = os.path.join(self.path, name)
+                st = os.stat(filename)
+
+                entries.append((st.st_mtime, st.st_size, filename))
+        except OSError as e:
+            DEBUG("surface cache: could not list %s: %s" % (self.path, str(e)))
+            return
+
+        total = sum(size for mtime, size, filename in entries)
+
+        entries.sort()
+
+        while total > self.max_size and entries:
+            mtime, size, filename = entries.pop(0)
+
+            DEBUG("surface cache: evicting %s" % filename)
+
+            self.remove(filename)
+            total -= size
+
+    def remove(self, filename):
+        try:
+            os.remove(filename)
+        except OSError:
+            pass
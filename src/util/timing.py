@@ -0,0 +1,219 @@
+#!/usr/bin/python3
+
+import functools
+import json
+import os
+import threading
+import time
+
+from gi.repository import GLib
+
+# Phase timing and span tracing for the activation, refresh and unlock paths.
+#
+# Phases are started and ended explicitly (often in different callbacks).  When
+# printing is enabled (--print-timings), the duration of each phase is printed as:
+#
+#     cs-timing: <phase> <milliseconds>
+#
+# tests/benchmark-lock reads these to report per-phase latencies.  Counters
+# (see count()) are printed with their running total each time they change:
+#
+#     cs-counter: <name> <total>
+#
+# tests/benchmark-hotplug reads these to count stage refreshes.  Gauges (see gauge())
+# are printed the same way, with their current value.
+#
+# When tracing is enabled (--trace=<file>, or the SetTracing dbus method), phases
+# and any function decorated with @traced are recorded, and written out in the
+# Chrome trace event format - these files can be loaded in chrome://tracing or
+# https://ui.perfetto.dev.
+#
+# When both are disabled, every call here returns after checking a flag.
+
+Enabled = False
+Tracing = False
+
+PREFIX = "cs-timing:"
+COUNTER_PREFIX = "cs-counter:"
+
+# Keep memory bounded if tracing is left running for a long time.
+MAX_TRACE_EVENTS = 100000
+
+TracePath = None
+
+_started = {}
+_counters = {}
+_events = []
+_pid = os.getpid()
+
+def start(name):
+    """
+    Marks the beginning of a phase that will be ended somewhere else
+    (for instance, in a callback).
+    """
+    if not (Enabled or Tracing):
+        return
+
+    _started[name] = time.monotonic()
+
+def end(name):
+    """
+    Ends a phase begun with start(), and reports its duration.  Does nothing
+    if the phase was never started.
+    """
+    if not (Enabled or Tracing):
+        return
+
+    try:
+        started = _started.pop(name)
+    except KeyError:
+        return
+
+    ended = time.monotonic()
+
+    if Enabled:
+        _report(name, ended - started)
+
+    if Tracing:
+        # Phases can begin and end in different mainloop callbacks, so they don't
+        # necessarily nest with the calls around them - record them as async spans.
+        _add_event({ "name": name, "cat": "phase", "ph": "b", "id": name, "ts": _us(started) })
+        _add_event({ "name": name, "cat": "phase", "ph": "e", "id": name, "ts": _us(ended) })
+
+def cancel(name):
+    """
+    Forgets about a phase that was started but won't complete.
+    """
+    _started.pop(name, None)
+
+class phase:
+    """
+    Context manager for a phase that begins and ends in the same place:
+
+        with timing.phase("grab_root"):
+            ...
+    """
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        start(self.name)
+        return self
+
+    def __exit__(self, *args):
+        end(self.name)
+        return False
+
+def count(name):
+    """
+    Increments a counter, and returns its new total.  Counters are always kept (they're
+    cheap), but only printed if timing is enabled, and recorded if tracing.
+    """
+    total = _counters.get(name, 0) + 1
+    _counters[name] = total
+
+    if Enabled:
+        print("%s %s %d" % (COUNTER_PREFIX, name, total), flush=True)
+
+    if Tracing:
+        _add_event({ "name": name, "cat": "counter", "ph": "C",
+                     "ts": _us(time.monotonic()), "args": { name: total } })
+
+    return total
+
+def gauge(name, value):
+    """
+    Sets a value (like a memory size), reported the same way as a counter.
+    """
+    _counters[name] = value
+
+    if Enabled:
+        print("%s %s %d" % (COUNTER_PREFIX, name, value), flush=True)
+
+    if Tracing:
+        _add_event({ "name": name, "cat": "counter", "ph": "C",
+                     "ts": _us(time.monotonic()), "args": { name: value } })
+
+def get_count(name):
+    return _counters.get(name, 0)
+
+def traced(func):
+    """
+    Decorator - records a span for each call to func while tracing is enabled.
+    """
+    name = func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not Tracing:
+            return func(*args, **kwargs)
+
+        started = time.monotonic()
+
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _add_event({ "name": name, "cat": "call", "ph": "X",
+                         "ts": _us(started), "dur": _us(time.monotonic() - started) })
+
+    return wrapper
+
+def get_default_trace_path():
+    return os.path.join(GLib.get_user_runtime_dir(), "cinnamon-screensaver-trace.json")
+
+def set_tracing(enabled, path=None):
+    """
+    Starts or stops recording trace events.  When stopping, anything recorded
+    is written out - to path, if one is given, otherwise to the current trace file.
+    """
+    global Tracing, TracePath
+
+    if enabled:
+        if path:
+            TracePath = path
+        elif TracePath is None:
+            TracePath = get_default_trace_path()
+
+        del _events[:]
+        Tracing = True
+
+        print("Tracing enabled, writing to %s" % TracePath, flush=True)
+    elif Tracing:
+        if path:
+            TracePath = path
+
+        Tracing = False
+        flush_trace()
+
+def flush_trace():
+    """
+    Writes all events recorded so far to the trace file.  This is called after each
+    deactivation and at exit, so the file is always reasonably current.
+    """
+    if TracePath is None or len(_events) == 0:
+        return
+
+    tmp_path = TracePath + ".tmp"
+
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump({ "traceEvents": _events, "displayTimeUnit": "ms" }, f)
+
+        os.replace(tmp_path, TracePath)
+    except OSError as e:
+        print("Could not write trace file '%s': %s" % (TracePath, str(e)), flush=True)
+
+def _add_event(event):
+    if len(_events) >= MAX_TRACE_EVENTS:
+        return
+
+    event["pid"] = _pid
+    event["tid"] = threading.get_native_id()
+
+    _events.append(event)
+
+def _us(seconds):
+    return seconds * 1000000.0
+
+def _report(name, seconds):
+    print("%s %s %.3f" % (PREFIX, name, seconds * 1000.0), flush=True)
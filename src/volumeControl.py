@@ -42,6 +42,36 @@ class VolumeControl(Gtk.Box):
         self.controller.open()
         self.on_state_changed()
 
+    def release_sound_controller(self):
+        """
+        Closes our mixer connection while we're not needed (a retained Stage, in resident mode.)
+        initialize_sound_controller() opens it again.
+        """
+        if self.controller is None:
+            return
+
+        trackers.con_tracker_get().disconnect(self.controller,
+                                              "state-changed",
+                                              self.on_state_changed)
+
+        trackers.con_tracker_get().disconnect(self.controller,
+                                              "default-sink-changed",
+                                              self.on_state_changed)
+
+        if self.output is not None:
+            trackers.con_tracker_get().disconnect(self.output,
+                                                  "notify::is-muted",
+                                                  self.on_volume_changed)
+            trackers.con_tracker_get().disconnect(self.output,
+                                                  "notify::volume",
+                                                  self.on_volume_changed)
+            self.output = None
+
+        self.controller.close()
+        self.controller = None
+
+        self.hide()
+
     def on_state_changed(self, controller=None, state=0):
         if controller and controller != self.controller:
             old = self.controller
@@ -0,0 +1,554 @@
+#!/usr/bin/python3
+
+import collections
+import concurrent.futures
+import math
+import os
+import cairo
+
+from gi.repository import Gdk, GdkPixbuf, Gio, GLib
+
+import constants as c
+from util import settings, timing
+from util.surfaceCache import SurfaceCache
+from util.utils import DEBUG
+
+# Bump this if the way wallpapers are rendered changes - anything saved
+# on disk by an older version won't be used.
+RENDER_VERSION = 4
+
+def get_bg_params():
+    """
+    Reads what our worker threads need to render the background from the settings - the
+    picture's filename and placement, and the color shading and colors.  This has to be
+    done on the main thread.  Returns None for slideshows, which can only be rendered by
+    CinnamonDesktop.BG (on the main thread.)
+    """
+    bg_settings = settings.bg_settings
+
+    uri = bg_settings.get_string("picture-uri")
+    filename = None
+
+    if uri != "":
+        filename = Gio.File.new_for_uri(uri).get_path()
+
+        if filename is not None and filename.endswith(".xml"):
+            return None
+
+    primary = Gdk.RGBA()
+    primary.parse(bg_settings.get_string("primary-color"))
+
+    secondary = Gdk.RGBA()
+    secondary.parse(bg_settings.get_string("secondary-color"))
+
+    return (filename,
+            bg_settings.get_string("picture-options"),
+            bg_settings.get_string("color-shading-type"),
+            (primary.red, primary.green, primary.blue),
+            (secondary.red, secondary.green, secondary.blue))
+
+# The functions below render a background the same way CinnamonDesktop.BG does (see gnome-bg.c
+# in cinnamon-desktop - gnome_bg_draw() for a non-root window), step for step, using only
+# GdkPixbuf and cairo, so they can run in our worker threads.  If BG changes how it draws,
+# these need to follow, and RENDER_VERSION needs bumping.
+
+def _render(params, width, height, scale, tiles):
+    """
+    Renders the background described by params (see get_bg_params()) at width x height (in
+    application pixels), and returns a surface for each of tiles (an (x, y, width, height)
+    part of it, or None for all of it.)  This runs in one of our worker threads.
+    """
+    filename, placement, shading, primary, secondary = params
+
+    pixbuf = _draw_color(shading, primary, secondary, width * scale, height * scale)
+
+    if filename is not None and placement != "none":
+        try:
+            picture = GdkPixbuf.Pixbuf.new_from_file(filename)
+        except GLib.Error as e:
+            # Like CinnamonDesktop.BG, show just the color.
+            DEBUG("wallpaper cache: could not load %s: %s" % (filename, e.message))
+            picture = None
+
+        if picture is not None:
+            _draw_picture(pixbuf, picture.apply_embedded_orientation(), placement)
+
+    return _get_tiles(pixbuf, width, height, scale, tiles)
+
+def _get_tiles(pixbuf, width, height, scale, tiles):
+    """
+    Returns a shaded surface for each of tiles, from a pixbuf of the whole background.
+    """
+    surface = _surface_from_pixbuf(pixbuf)
+    surface.set_device_scale(scale, scale)
+
+    surfaces = {}
+
+    for tile in tiles:
+        if tile is None:
+            surfaces[tile] = _shade(surface)
+        else:
+            surfaces[tile] = _shade(_crop(surface, tile, scale))
+
+    return surfaces
+
+def _draw_color(shading, primary, secondary, width, height):
+    """
+    Returns a width x height pixbuf filled with the background color (or gradient.)
+    """
+    if shading == "solid":
+        r, g, b = [int(0xff * channel) for channel in primary]
+
+        pixbuf = GdkPixbuf.Pixbuf.new(GdkPixbuf.Colorspace.RGB, False, 8, width, height)
+        pixbuf.fill((r << 24) | (g << 16) | (b << 8) | 0xff)
+
+        return pixbuf
+
+    # A one pixel strip of the gradient, stretched across the other direction.
+    length = height if shading == "vertical" else width
+    strip = bytearray()
+
+    for i in range(length):
+        ratio = (i + 0.5) / length
+        strip += bytes(int(((p * (1 - ratio)) + (s * ratio)) * 0xff) for p, s in zip(primary, secondary))
+
+    if shading == "vertical":
+        strip_pixbuf = GdkPixbuf.Pixbuf.new_from_bytes(GLib.Bytes.new(strip), GdkPixbuf.Colorspace.RGB,
+                                                       False, 8, 1, length, 3)
+    else:
+        strip_pixbuf = GdkPixbuf.Pixbuf.new_from_bytes(GLib.Bytes.new(strip), GdkPixbuf.Colorspace.RGB,
+                                                       False, 8, length, 1, length * 3)
+
+    return strip_pixbuf.scale_simple(width, height, GdkPixbuf.InterpType.NEAREST)
+
+def _scale_to_fit(picture, width, height):
+    factor = min(width / picture.get_width(), height / picture.get_height())
+
+    return picture.scale_simple(math.floor((picture.get_width() * factor) + 0.5),
+                                math.floor((picture.get_height() * factor) + 0.5),
+                                GdkPixbuf.InterpType.BILINEAR)
+
+def _scale_to_min(picture, width, height):
+    factor = max(width / picture.get_width(), height / picture.get_height())
+
+    new_width = math.floor((picture.get_width() * factor) + 0.5)
+    new_height = math.floor((picture.get_height() * factor) + 0.5)
+
+    scaled = GdkPixbuf.Pixbuf.new(GdkPixbuf.Colorspace.RGB, picture.get_has_alpha(), 8, width, height)
+    picture.scale(scaled, 0, 0, width, height,
+                  int((new_width - width) / -2), int((new_height - height) / -2),
+                  factor, factor,
+                  GdkPixbuf.InterpType.BILINEAR)
+
+    return scaled
+
+def _clip_to_fit(picture, width, height):
+    picture_width = picture.get_width()
+    picture_height = picture.get_height()
+
+    if picture_width < width and picture_height < height:
+        return picture
+
+    clip_width = min(picture_width, width)
+    clip_height = min(picture_height, height)
+
+    return picture.new_subpixbuf((picture_width - clip_width) // 2,
+                                 (picture_height - clip_height) // 2,
+                                 clip_width,
+                                 clip_height)
+
+def _blend(src, dest, dest_x, dest_y):
+    """
+    Composites all of src into dest at dest_x, dest_y, clipped to dest.
+    """
+    x = max(dest_x, 0)
+    y = max(dest_y, 0)
+    width = min(dest_x + src.get_width(), dest.get_width()) - x
+    height = min(dest_y + src.get_height(), dest.get_height()) - y
+
+    if width <= 0 or height <= 0:
+        return
+
+    src.composite(dest, x, y, width, height, dest_x, dest_y, 1.0, 1.0, GdkPixbuf.InterpType.NEAREST, 0xff)
+
+def _draw_picture(pixbuf, picture, placement):
+    """
+    Composites picture into pixbuf, placed according to placement (the picture-options setting.)
+    """
+    width = pixbuf.get_width()
+    height = pixbuf.get_height()
+
+    if placement in ("scaled", "spanned"):
+        scaled = _scale_to_fit(picture, width, height)
+    elif placement == "zoom":
+        scaled = _scale_to_min(picture, width, height)
+    elif placement == "stretched":
+        scaled = picture.scale_simple(width, height, GdkPixbuf.InterpType.BILINEAR)
+    else:
+        # centered and wallpaper (tiled)
+        scaled = _clip_to_fit(picture, width, height)
+
+    if placement == "wallpaper":
+        for y in range(0, height, scaled.get_height()):
+            for x in range(0, width, scaled.get_width()):
+                _blend(scaled, pixbuf, x, y)
+    else:
+        _blend(scaled, pixbuf, (width - scaled.get_width()) // 2, (height - scaled.get_height()) // 2)
+
+def _surface_from_pixbuf(pixbuf):
+    """
+    Copies a pixbuf into a new RGB24 image surface.  This is all done by GDK and cairo's
+    pixel conversion, which doesn't touch the display (so is safe in our worker threads),
+    and runs without holding the GIL.
+    """
+    surface = cairo.ImageSurface(cairo.FORMAT_RGB24, pixbuf.get_width(), pixbuf.get_height())
+
+    cr = cairo.Context(surface)
+    Gdk.cairo_set_source_pixbuf(cr, pixbuf, 0, 0)
+    cr.set_operator(cairo.OPERATOR_SOURCE)
+    cr.paint()
+
+    surface.flush()
+
+    return surface
+
+def _crop(surface, tile, scale):
+    """
+    Copies a tile (in application pixels) out of surface, into a new one with a device scale
+    of scale.  If surface has a different device scale, it's resampled here, once, rather than
+    every time it's drawn.
+    """
+    x, y, width, height = tile
+
+    cropped = cairo.ImageSurface(cairo.FORMAT_RGB24, width * scale, height * scale)
+    cropped.set_device_scale(scale, scale)
+
+    cr = cairo.Context(cropped)
+    cr.set_source_surface(surface, -x, -y)
+    cr.paint()
+
+    return cropped
+
+def _shade(surface):
+    """
+    Darkens the wallpaper, so our widgets stand out against it.  This is done once, when the
+    surface is rendered, rather than every time the wallpaper is drawn.
+    """
+    cr = cairo.Context(surface)
+    cr.set_source_rgba(0.0, 0.0, 0.0, c.WALLPAPER_SHADE_ALPHA)
+    cr.paint()
+
+    surface.flush()
+
+    return surface
+
+def _upload(surface):
+    """
+    Copies a rendered wallpaper into a pixmap on the X server.  Drawing from that is done by
+    the server, so redrawing a part of the wallpaper (after an expose, or under a widget that
+    changed) doesn't send its pixels to the server again.  Returns surface itself if that
+    isn't possible.
+    """
+    root = Gdk.get_default_root_window()
+
+    if root is None:
+        return surface
+
+    scale_x, scale_y = surface.get_device_scale()
+    root_scale = root.get_scale_factor()
+
+    # The pixmap has to be exactly the same size, or it would be drawn offset (and filtered.)
+    if surface.get_width() % root_scale != 0 or surface.get_height() % root_scale != 0:
+        return surface
+
+    uploaded = root.create_similar_surface(cairo.CONTENT_COLOR,
+                                           surface.get_width() // root_scale,
+                                           surface.get_height() // root_scale)
+
+    if uploaded is None or isinstance(uploaded, cairo.ImageSurface):
+        return surface
+
+    uploaded.set_device_scale(scale_x, scale_y)
+
+    cr = cairo.Context(uploaded)
+    cr.set_source_surface(surface, 0, 0)
+    cr.paint()
+
+    uploaded.flush()
+
+    return uploaded
+
+class WallpaperCache:
+    """
+    Renders our wallpapers, and keeps the ones we've rendered so locking again (or refreshing
+    the Stage) doesn't decode and scale the background picture all over again.
+
+    Decoding and scaling a large picture is slow, so it happens in a pool of worker threads -
+    request() reads the background settings, and hands the finished surface back on the main
+    loop.  Requests made in the same main loop iteration are started together, at idle, and
+    requests for the same size share a single render.  Slideshows are still rendered on the
+    main thread, by CinnamonDesktop.BG.
+
+    A request can be for a tile of the background (a spanned one, for instance) - only the
+    tiles that were asked for are kept, so memory use depends on the area of our monitors,
+    rather than the area of the screen.
+
+    Entries are keyed by the background settings, the modification time of the picture,
+    and the size, tile and scale factor they were rendered at, so anything that would change
+    the result misses.  Rendered surfaces already have the shade applied, and are shared by
+    every Gtk.Image showing them - they're never drawn to after being rendered.
+
+    The least recently used entries are dropped once the cache grows past max_size bytes,
+    and everything is dropped when the background settings change.
+
+    Once rendered, wallpapers are copied to the X server, and the surfaces we hand out (and
+    keep here) are the server-side copies - drawing them doesn't involve sending any pixels
+    to the server.
+
+    Rendered wallpapers are also saved to disk (in the background, after they're first
+    rendered), and mapped straight back in by the next process that needs them - so even
+    the first activation after logging in doesn't need to decode anything, as long as the
+    background hasn't changed.
+
+    Slideshows aren't cached - what they show depends on the time.
+    """
+    def __init__(self, bg, max_size=c.WALLPAPER_CACHE_SIZE):
+        self.bg = bg
+        self.max_size = max_size
+
+        self.entries = collections.OrderedDict()
+        self.size = 0
+
+        self.disk_cache = SurfaceCache(os.path.join(GLib.get_user_cache_dir(), "cinnamon-screensaver", "wallpapers"),
+                                       c.WALLPAPER_DISK_CACHE_SIZE)
+
+        # Renders waiting to start, and ones in progress.  Each is keyed by the generation,
+        # the background parameters and the size it's rendered at, and has a list of callbacks for each tile.  Bumping
+        # the generation keeps requests made after a settings change from sharing an older render.
+        self.pool = None
+        self.batch = {}
+        self.running = []
+        self.dispatch_id = 0
+        self.generation = 0
+        self.threaded = True
+
+        settings.bg_settings.connect("changed", self.on_bg_settings_changed)
+
+    def request(self, width, height, scale, callback, *args, tile=None):
+        """
+        Calls callback(surface, *args) with the current background, rendered at width x height,
+        or just the (x, y, width, height) tile of it, if one is given.  If it's cached, that
+        happens right away, and this returns True.  Otherwise it's rendered in the background,
+        and this returns False.
+        """
+        key = self.get_key(width, height, scale, tile)
+        size = get_size(width, height, scale, tile)
+
+        if key is not None and key in self.entries:
+            self.entries.move_to_end(key)
+            timing.count("wallpaper_cache_hit")
+
+            callback(self.entries[key][0], *args)
+            return True
+
+        timing.count("wallpaper_cache_miss")
+
+        if key is not None:
+            surface = self.disk_cache.load((RENDER_VERSION, c.WALLPAPER_SHADE_ALPHA, key))
+
+            if surface is not None:
+                timing.count("wallpaper_disk_cache_hit")
+
+                surface = self.add(key, surface, size)
+
+                callback(surface, *args)
+                return True
+
+        params = get_bg_params()
+
+        if not self.threaded or params is None:
+            with timing.phase("render_wallpaper"):
+                surface = self.render_now(width, height, scale, [tile])[tile]
+
+            self.save(key, surface)
+            surface = self.add(key, surface, size)
+
+            callback(surface, *args)
+            return True
+
+        render_key = (self.generation, params, width, height, scale)
+
+        for running_key, tiles in self.running:
+            if running_key == render_key and tile in tiles:
+                tiles[tile][1].append((callback, args))
+                return False
+
+        tiles = self.batch.setdefault(render_key, {})
+        tiles.setdefault(tile, (key, []))[1].append((callback, args))
+
+        if self.dispatch_id == 0:
+            self.dispatch_id = GLib.idle_add(self.dispatch, priority=GLib.PRIORITY_DEFAULT)
+
+        return False
+
+    def dispatch(self):
+        self.dispatch_id = 0
+
+        if not self.running:
+            timing.start("render_wallpapers")
+
+        for render_key, tiles in self.batch.items():
+            generation, params, width, height, scale = render_key
+            job = (render_key, tiles)
+
+            self.running.append(job)
+
+            future = self.get_pool().submit(_render, params, width, height, scale, list(tiles.keys()))
+            future.add_done_callback(lambda f, job=job: GLib.idle_add(self.on_render_finished,
+                                                                      job, f,
+                                                                      priority=GLib.PRIORITY_DEFAULT))
+
+            DEBUG("wallpaper cache: rendering %dx%d@%d (%d tiles) in the background" % (width, height, scale, len(tiles)))
+
+        self.batch = {}
+
+        return False
+
+    def on_render_finished(self, job, future):
+        self.running.remove(job)
+
+        render_key, tiles = job
+        generation, params, width, height, scale = render_key
+
+        try:
+            surfaces = future.result()
+        except Exception as e:
+            print("Could not render the wallpaper in the background, rendering it on the main thread from now on: %s" % str(e), flush=True)
+            self.threaded = False
+
+            surfaces = self.render_now(width, height, scale, tiles.keys())
+
+        if not self.running:
+            timing.end("render_wallpapers")
+
+        for tile, (key, callbacks) in tiles.items():
+            surface = surfaces[tile]
+
+            if generation == self.generation:
+                self.save(key, surface)
+                surface = self.add(key, surface, get_size(width, height, scale, tile))
+            else:
+                surface = _upload(surface)
+
+            for callback, args in callbacks:
+                callback(surface, *args)
+
+        return False
+
+    def get_pool(self):
+        if self.pool is None:
+            self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=c.WALLPAPER_RENDER_THREADS,
+                                                              thread_name_prefix="wallpaper")
+
+        return self.pool
+
+    def save(self, key, surface):
+        """
+        Writes a newly rendered wallpaper to the disk cache, from a worker thread.
+        """
+        if key is None or surface is None:
+            return
+
+        self.get_pool().submit(self.disk_cache.store, (RENDER_VERSION, c.WALLPAPER_SHADE_ALPHA, key), surface)
+
+    def render_now(self, width, height, scale, tiles):
+        """
+        Renders the background on the main thread, with our CinnamonDesktop.BG (for slideshows,
+        or if rendering in the background failed.)  This draws at the device size, same as
+        _render(), so both give the same result.
+        """
+        pixbuf = GdkPixbuf.Pixbuf.new(GdkPixbuf.Colorspace.RGB, False, 8, width * scale, height * scale)
+        self.bg.draw(pixbuf, Gdk.Screen.get_default(), False)
+
+        return _get_tiles(pixbuf, width, height, scale, tiles)
+
+    def add(self, key, surface, size):
+        """
+        Uploads a newly rendered surface to the X server, and caches the uploaded copy, which
+        is returned.
+        """
+        if surface is None:
+            return None
+
+        with timing.phase("upload_wallpaper"):
+            surface = _upload(surface)
+
+        if key is None or key in self.entries or size > self.max_size:
+            return surface
+
+        self.entries[key] = (surface, size)
+        self.size += size
+
+        while self.size > self.max_size:
+            old_key, (old_surface, old_size) = self.entries.popitem(last=False)
+            self.size -= old_size
+
+            DEBUG("wallpaper cache: evicted %s" % describe_key(old_key))
+
+        DEBUG("wallpaper cache: added %s, %d entries, %d bytes" % (describe_key(key), len(self.entries), self.size))
+
+        return surface
+
+    def get_key(self, width, height, scale, tile):
+        """
+        Returns the cache key for the current background at this size, or None if it
+        shouldn't be cached.
+        """
+        keys = settings.bg_settings.props.settings_schema.list_keys()
+        values = tuple("%s=%s" % (key, settings.bg_settings.get_value(key).print_(False)) for key in sorted(keys))
+
+        uri = settings.bg_settings.get_string("picture-uri")
+        mtime = 0
+
+        if uri != "":
+            path = Gio.File.new_for_uri(uri).get_path()
+
+            if path is None or path.endswith(".xml"):
+                return None
+
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                # Missing pictures are rendered as the background color - but if it shows up
+                # later, we don't want to keep using that.
+                return None
+
+        return (values, mtime, width, height, scale, tile)
+
+    def clear(self):
+        if self.entries:
+            DEBUG("wallpaper cache: cleared %d entries (%d bytes)" % (len(self.entries), self.size))
+
+        self.entries.clear()
+        self.size = 0
+
+    def on_bg_settings_changed(self, settings, key):
+        self.generation += 1
+        self.clear()
+
+def get_size(width, height, scale, tile):
+    """
+    Returns the size, in bytes, of a rendered wallpaper (or tile of one.)
+    """
+    if tile is not None:
+        width, height = tile[2], tile[3]
+
+    return width * height * scale * scale * 4
+
+def describe_key(key):
+    values, mtime, width, height, scale, tile = key
+
+    if tile is None:
+        return "%dx%d@%d" % (width, height, scale)
+
+    return "%dx%d+%d+%d of %dx%d@%d" % (tile[2], tile[3], tile[0], tile[1], width, height, scale)
@@ -59,6 +59,11 @@ class NotificationWidget(Gtk.Frame):
 
         self.emit("notification")
 
+    def reset(self):
+        self.notification_count = 0
+
+        self.update_label()
+
     def should_show(self):
         return self.notification_count > 0
 